@@ -103,8 +103,9 @@ async def login(request: LoginRequest, req: Request):
             "permissions": user["permissions"]
         }
         
-        access_token = auth_manager.create_access_token(token_data)
-        refresh_token = auth_manager.create_refresh_token({"sub": user["user_id"]})
+        now = req.state.now
+        access_token = auth_manager.create_access_token(token_data, now)
+        refresh_token = auth_manager.create_refresh_token({"sub": user["user_id"]}, now)
         
         # Create session
         if session_manager:
@@ -180,7 +181,7 @@ async def register(request: RegisterRequest):
         raise HTTPException(status_code=500, detail="Registration failed")
 
 @router.post("/refresh", response_model=TokenResponse)
-async def refresh_token(refresh_token: str):
+async def refresh_token(refresh_token: str, req: Request):
     """Refresh access token using refresh token"""
     try:
         if not auth_manager or not user_manager:
@@ -211,7 +212,7 @@ async def refresh_token(refresh_token: str):
             "permissions": user["permissions"]
         }
         
-        access_token = auth_manager.create_access_token(token_data)
+        access_token = auth_manager.create_access_token(token_data, req.state.now)
         
         return TokenResponse(
             access_token=access_token,
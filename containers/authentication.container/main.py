@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,6 +6,7 @@ from contextlib import asynccontextmanager
 import logging
 from typing import Dict, Any, Optional
 import asyncio
+import time
 
 from core.config import settings
 from services.auth_manager import AuthManager
@@ -73,6 +74,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def stamp_request_time(request: Request, call_next):
+    """Capture one wall-clock timestamp per request for token expiry maths"""
+    request.state.now = time.time()
+    return await call_next(request)
+
 # Include API router
 app.include_router(api_router)
 
@@ -1,29 +1,69 @@
 import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Tuple, Union
 import hashlib
+import re
 import secrets
+import time
 
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+import jwt
+from jwt import InvalidTokenError
+import bcrypt
+import orjson
 import redis.asyncio as redis
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Hash idents produced by bcrypt (and passlib's bcrypt backend)
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+
+# Password character-class checks, compiled once so scans run in the regex engine
+_UPPER_RE = re.compile(r"[A-Z]")
+_LOWER_RE = re.compile(r"[a-z]")
+_DIGIT_RE = re.compile(r"\d")
+_SPECIAL_RE = re.compile(r"[!@#$%^&*()_+\-=\[\]{}|;:,.<>?]")
+
 class AuthManager:
     """Core authentication manager with JWT and password handling"""
     
     def __init__(self):
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self._bcrypt = bcrypt
+        self._legacy_pwd_context = None
+        # Decoded JWT payloads keyed by token digest, evicted LRU-first
+        self._jwt_cache: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Validated API key data keyed by storage key, expiring after API_KEY_CACHE_TTL
+        self._api_key_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
         self.redis_client: Optional[redis.Redis] = None
         self.db_engine = None
         self.db_session_factory = None
         
+        # Snapshot hot-path settings so token and password checks skip settings lookups
+        self._secret_key = settings.SECRET_KEY
+        self._algorithm = settings.ALGORITHM
+        self._algorithms = [settings.ALGORITHM]
+        self._access_token_seconds = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        self._refresh_token_seconds = settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+        self._jwt_cache_size = settings.JWT_CACHE_SIZE
+        self._api_key_prefix = settings.API_KEY_PREFIX.encode()
+        self._api_key_cache_size = settings.API_KEY_CACHE_SIZE
+        self._api_key_cache_ttl = settings.API_KEY_CACHE_TTL
+        self._pw_min_length = settings.PASSWORD_MIN_LENGTH
+        self._pw_checks = tuple(
+            (pattern, message)
+            for enabled, pattern, message in (
+                (settings.PASSWORD_REQUIRE_UPPERCASE, _UPPER_RE, "Password must contain at least one uppercase letter"),
+                (settings.PASSWORD_REQUIRE_LOWERCASE, _LOWER_RE, "Password must contain at least one lowercase letter"),
+                (settings.PASSWORD_REQUIRE_NUMBERS, _DIGIT_RE, "Password must contain at least one number"),
+                (settings.PASSWORD_REQUIRE_SPECIAL, _SPECIAL_RE, "Password must contain at least one special character"),
+            )
+            if enabled
+        )
+        
     async def initialize(self):
         """Initialize database and Redis connections"""
         try:
@@ -41,12 +81,14 @@ class AuthManager:
             self.db_engine = create_async_engine(
                 settings.DATABASE_URL,
                 echo=False,
-                pool_pre_ping=True
+                pool_pre_ping=True,
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_recycle=settings.DB_POOL_RECYCLE
             )
             
-            self.db_session_factory = sessionmaker(
+            self.db_session_factory = async_sessionmaker(
                 self.db_engine,
-                class_=AsyncSession,
                 expire_on_commit=False
             )
             
@@ -56,58 +98,100 @@ class AuthManager:
             logger.error(f"❌ Failed to initialize auth manager: {e}")
             raise
     
-    def hash_password(self, password: str) -> str:
-        """Hash a password using bcrypt"""
-        return self.pwd_context.hash(password)
+    async def hash_password(self, password: str) -> str:
+        """Hash a password using bcrypt (off the event loop)"""
+        salt = self._bcrypt.gensalt(settings.PASSWORD_HASH_ROUNDS)
+        hashed = await asyncio.to_thread(self._bcrypt.hashpw, password.encode(), salt)
+        return hashed.decode()
     
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash"""
-        return self.pwd_context.verify(plain_password, hashed_password)
+        if not hashed_password.startswith(BCRYPT_PREFIXES):
+            return await asyncio.to_thread(self._verify_legacy_password, plain_password, hashed_password)
+        
+        return await asyncio.to_thread(
+            self._bcrypt.checkpw, plain_password.encode(), hashed_password.encode()
+        )
+    
+    def _verify_legacy_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify legacy hashes bcrypt can't parse directly (e.g. the original $2$ ident)"""
+        if self._legacy_pwd_context is None:
+            from passlib.context import CryptContext
+            self._legacy_pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        try:
+            return self._legacy_pwd_context.verify(plain_password, hashed_password)
+        except ValueError:
+            return False
     
     def validate_password_strength(self, password: str) -> tuple[bool, List[str]]:
         """Validate password meets security requirements"""
         issues = []
         
-        if len(password) < settings.PASSWORD_MIN_LENGTH:
-            issues.append(f"Password must be at least {settings.PASSWORD_MIN_LENGTH} characters")
-        
-        if settings.PASSWORD_REQUIRE_UPPERCASE and not any(c.isupper() for c in password):
-            issues.append("Password must contain at least one uppercase letter")
-        
-        if settings.PASSWORD_REQUIRE_LOWERCASE and not any(c.islower() for c in password):
-            issues.append("Password must contain at least one lowercase letter")
+        if len(password) < self._pw_min_length:
+            issues.append(f"Password must be at least {self._pw_min_length} characters")
         
-        if settings.PASSWORD_REQUIRE_NUMBERS and not any(c.isdigit() for c in password):
-            issues.append("Password must contain at least one number")
-        
-        if settings.PASSWORD_REQUIRE_SPECIAL and not any(c in "!@#$%^&*()_+-=[]{}|;:,.<>?" for c in password):
-            issues.append("Password must contain at least one special character")
+        for pattern, message in self._pw_checks:
+            if not pattern.search(password):
+                issues.append(message)
         
         return len(issues) == 0, issues
     
-    def create_access_token(self, data: Dict[str, Any]) -> str:
-        """Create JWT access token"""
+    def create_access_token(self, data: Dict[str, Any], now: Optional[float] = None) -> str:
+        """Create JWT access token (``now`` is the request's epoch timestamp, if known)"""
         to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        to_encode.update({"exp": expire, "type": "access"})
+        issued_at = int(now if now is not None else time.time())
+        to_encode.update({"exp": issued_at + self._access_token_seconds, "type": "access"})
         
-        encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        encoded_jwt = jwt.encode(to_encode, self._secret_key, algorithm=self._algorithm)
         return encoded_jwt
     
-    def create_refresh_token(self, data: Dict[str, Any]) -> str:
-        """Create JWT refresh token"""
+    def create_refresh_token(self, data: Dict[str, Any], now: Optional[float] = None) -> str:
+        """Create JWT refresh token (``now`` is the request's epoch timestamp, if known)"""
         to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-        to_encode.update({"exp": expire, "type": "refresh"})
+        issued_at = int(now if now is not None else time.time())
+        to_encode.update({"exp": issued_at + self._refresh_token_seconds, "type": "refresh"})
         
-        encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        encoded_jwt = jwt.encode(to_encode, self._secret_key, algorithm=self._algorithm)
         return encoded_jwt
     
+    @staticmethod
+    def _token_cache_key(token: str) -> bytes:
+        """Short digest used to key the decoded-token cache"""
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+    
+    @staticmethod
+    def _blacklist_key(token_digest: bytes) -> str:
+        """Fixed-size Redis blacklist key for a token digest"""
+        return f"bl:{token_digest.hex()}"
+    
+    def _decode_token(self, token: str, key: Optional[bytes] = None) -> Dict[str, Any]:
+        """Decode JWT, reusing a cached payload until the token expires"""
+        if key is None:
+            key = self._token_cache_key(token)
+        cached = self._jwt_cache.get(key)
+        if cached is not None:
+            exp, payload = cached
+            if exp > time.time():
+                self._jwt_cache.move_to_end(key)
+                return payload
+            del self._jwt_cache[key]
+        
+        payload = jwt.decode(token, self._secret_key, algorithms=self._algorithms)
+        
+        exp = payload.get("exp")
+        if exp:
+            self._jwt_cache[key] = (float(exp), payload)
+            if len(self._jwt_cache) > self._jwt_cache_size:
+                self._jwt_cache.popitem(last=False)
+        
+        return payload
+    
     async def validate_token(self, token: str) -> Optional[Dict[str, Any]]:
         """Validate JWT token and return user data"""
         try:
-            # Decode JWT
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            # Decode JWT (cached per token until exp)
+            token_digest = self._token_cache_key(token)
+            payload = self._decode_token(token, token_digest)
             
             # Check token type
             token_type = payload.get("type")
@@ -121,8 +205,12 @@ class AuthManager:
             
             # Check if token is blacklisted (if implementing token blacklist)
             if self.redis_client:
-                is_blacklisted = await self.redis_client.get(f"blacklist:{token}")
-                if is_blacklisted:
+                # Also read the legacy raw-token key until entries written before hashing expire
+                blacklisted = await self.redis_client.mget(
+                    self._blacklist_key(token_digest),
+                    f"blacklist:{token}"
+                )
+                if any(blacklisted):
                     return None
             
             # Return user data from token
@@ -135,7 +223,7 @@ class AuthManager:
                 "token_type": token_type
             }
             
-        except JWTError as e:
+        except InvalidTokenError as e:
             logger.warning(f"JWT validation error: {e}")
             return None
         except Exception as e:
@@ -145,18 +233,21 @@ class AuthManager:
     async def revoke_token(self, token: str):
         """Add token to blacklist"""
         try:
+            # Drop any cached decode so the blacklist is the only source of truth
+            token_digest = self._token_cache_key(token)
+            self._jwt_cache.pop(token_digest, None)
+            
             if self.redis_client:
                 # Decode to get expiration
-                payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+                payload = jwt.decode(token, self._secret_key, algorithms=self._algorithms)
                 exp = payload.get("exp")
                 
                 if exp:
                     # Calculate TTL until token would naturally expire
-                    expire_time = datetime.fromtimestamp(exp)
-                    ttl = int((expire_time - datetime.utcnow()).total_seconds())
+                    ttl = int(exp) - int(time.time())
                     
                     if ttl > 0:
-                        await self.redis_client.setex(f"blacklist:{token}", ttl, "revoked")
+                        await self.redis_client.setex(self._blacklist_key(token_digest), ttl, "revoked")
                         
         except Exception as e:
             logger.error(f"Error revoking token: {e}")
@@ -167,22 +258,45 @@ class AuthManager:
         api_key = f"{settings.API_KEY_PREFIX}{user_id}_{random_part}"
         return api_key
     
-    async def validate_api_key(self, api_key: str) -> Optional[Dict[str, Any]]:
-        """Validate API key and return user data"""
+    @staticmethod
+    def api_key_storage_key(api_key: Union[str, bytes]) -> str:
+        """Redis key under which an API key's user data is stored"""
+        if isinstance(api_key, str):
+            api_key = api_key.encode()
+        return f"api_key:{hashlib.blake2b(api_key, digest_size=16).hexdigest()}"
+    
+    async def validate_api_key(self, api_key: Union[str, bytes]) -> Optional[Dict[str, Any]]:
+        """Validate API key (str or raw header bytes) and return user data"""
         try:
-            if not api_key.startswith(settings.API_KEY_PREFIX):
+            # Encode once; prefix check and hashing both work on bytes
+            api_key_bytes = api_key.encode() if isinstance(api_key, str) else api_key
+            if not api_key_bytes.startswith(self._api_key_prefix):
                 return None
             
             # API key validation would typically involve database lookup
             # For now, return basic structure
-            api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+            storage_key = self.api_key_storage_key(api_key_bytes)
+            
+            # Serve repeat presentations of the same key from memory
+            cached = self._api_key_cache.get(storage_key)
+            if cached is not None:
+                expires_at, key_data = cached
+                if expires_at > time.monotonic():
+                    self._api_key_cache.move_to_end(storage_key)
+                    return key_data
+                del self._api_key_cache[storage_key]
             
             if self.redis_client:
-                # Check if API key exists and is valid
-                key_data = await self.redis_client.get(f"api_key:{api_key_hash}")
-                if key_data:
-                    import json
-                    return json.loads(key_data)
+                # Check if API key exists and is valid (legacy SHA-256 keys are still honoured)
+                legacy_key = f"api_key:{hashlib.sha256(api_key_bytes).hexdigest()}"
+                raw_data, legacy_data = await self.redis_client.mget(storage_key, legacy_key)
+                raw_data = raw_data or legacy_data
+                if raw_data:
+                    key_data = orjson.loads(raw_data)
+                    self._api_key_cache[storage_key] = (time.monotonic() + self._api_key_cache_ttl, key_data)
+                    if len(self._api_key_cache) > self._api_key_cache_size:
+                        self._api_key_cache.popitem(last=False)
+                    return key_data
             
             return None
             
@@ -194,33 +308,20 @@ class AuthManager:
         """Track login attempts for security monitoring"""
         try:
             if self.redis_client:
-                timestamp = datetime.utcnow().isoformat()
+                timestamp = datetime.now(timezone.utc).isoformat()
+                lockout_seconds = settings.LOCKOUT_DURATION_MINUTES * 60
+                
+                # Queue everything on one pipeline so the attempt costs a single round trip
+                pipe = self.redis_client.pipeline(transaction=False)
                 
-                # Track failed attempts for account lockout
                 if not success:
+                    # Atomic counter for account lockout; the window starts at the first failure
                     key = f"failed_attempts:{identifier}"
-                    current_attempts = await self.redis_client.get(key)
-                    attempts = int(current_attempts) + 1 if current_attempts else 1
-                    
-                    # Set expiration for lockout period
-                    await self.redis_client.setex(
-                        key, 
-                        settings.LOCKOUT_DURATION_MINUTES * 60, 
-                        str(attempts)
-                    )
-                    
-                    # Check if account should be locked
-                    if attempts >= settings.MAX_LOGIN_ATTEMPTS:
-                        await self.redis_client.setex(
-                            f"locked:{identifier}",
-                            settings.LOCKOUT_DURATION_MINUTES * 60,
-                            timestamp
-                        )
-                        logger.warning(f"Account locked due to excessive failed attempts: {identifier}")
+                    pipe.incr(key)
+                    pipe.expire(key, lockout_seconds, nx=True)
                 else:
                     # Clear failed attempts on successful login
-                    await self.redis_client.delete(f"failed_attempts:{identifier}")
-                    await self.redis_client.delete(f"locked:{identifier}")
+                    pipe.delete(f"failed_attempts:{identifier}", f"locked:{identifier}")
                 
                 # Log audit trail if enabled
                 if settings.LOG_AUTH_EVENTS:
@@ -232,12 +333,17 @@ class AuthManager:
                     }
                     
                     # Store in audit log (could be database or separate log service)
-                    await self.redis_client.lpush(
-                        f"audit_log:{identifier}",
-                        str(audit_data)
-                    )
+                    audit_key = f"audit_log:{identifier}"
+                    pipe.lpush(audit_key, orjson.dumps(audit_data))
                     # Keep last 100 audit entries
-                    await self.redis_client.ltrim(f"audit_log:{identifier}", 0, 99)
+                    pipe.ltrim(audit_key, 0, 99)
+                
+                results = await pipe.execute()
+                
+                # Check if account should be locked
+                if not success and int(results[0]) >= settings.MAX_LOGIN_ATTEMPTS:
+                    await self.redis_client.setex(f"locked:{identifier}", lockout_seconds, timestamp)
+                    logger.warning(f"Account locked due to excessive failed attempts: {identifier}")
                     
         except Exception as e:
             logger.error(f"Error tracking login attempt: {e}")
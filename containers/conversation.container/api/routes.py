@@ -1,16 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi.responses import ORJSONResponse, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from core.database import get_db, Conversation, Message, get_redis
+from sqlalchemy import select, delete, func, update, text
+from core.config import settings
+from core.database import (
+    get_db, Conversation, Message, get_redis, get_stream_redis,
+    ai_orchestrator_client, embedding_client
+)
+from services.streaming_ai import StreamingAIService
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uuid
-import json
-from datetime import datetime
+import orjson
+import tiktoken
+from datetime import datetime, timezone
 
 router = APIRouter()
 
-# Pydantic models
+# Pydantic models; response models document the API, while handlers return
+# pre-encoded responses so FastAPI skips output validation and re-serialization
 class MessageCreate(BaseModel):
     role: str  # 'user' or 'assistant'
     content: str
@@ -46,8 +54,117 @@ class ConversationWithMessages(BaseModel):
     is_active: bool
     messages: List[MessageResponse]
 
+# Rows fetched per round trip when streaming a conversation's messages
+MESSAGE_STREAM_BATCH_SIZE = 500
+
+# Loaded once at import; encoding lookups read BPE ranks from disk/network
+TOKEN_ENCODING = tiktoken.get_encoding("cl100k_base")
+
+def conversation_summary(conversation, message_count: int) -> Dict[str, Any]:
+    """ConversationResponse-shaped dict from a Conversation or projected row, encoded directly by orjson"""
+    return {
+        "id": conversation.id,
+        "user_id": conversation.user_id,
+        "title": conversation.title,
+        "created_at": conversation.created_at,
+        "updated_at": conversation.updated_at,
+        "is_active": conversation.is_active,
+        "message_count": message_count
+    }
+
+def conversation_cache_key(conversation_id) -> str:
+    """Redis key holding a serialized ConversationWithMessages payload"""
+    return f"conv:{conversation_id}"
+
+async def invalidate_conversation_cache(redis_client, *conversation_ids):
+    """Drop cached conversation payloads after a write; cache errors never fail the write"""
+    if not conversation_ids:
+        return
+    try:
+        await redis_client.delete(*(conversation_cache_key(cid) for cid in conversation_ids))
+    except Exception as e:
+        print(f"Conversation cache invalidation failed: {e}")
+
+def user_list_version_key(user_id) -> str:
+    """Redis counter whose value is part of every cached list key for the user"""
+    return f"ulist:{user_id}:ver"
+
+async def bump_user_list_version(redis_client, *user_ids):
+    """Orphan all cached list pages for the users; stale pages expire on their TTL"""
+    if not user_ids:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.incr(user_list_version_key(user_id))
+        await pipe.execute()
+    except Exception as e:
+        print(f"User list cache invalidation failed: {e}")
+
+# Conversation reads go straight to asyncpg: ids and metadata are cast to text
+# in SQL, so no ORM hydration, UUID objects or JSONB decoding happen in Python
+_CONVERSATION_JSON_SQL = """
+    SELECT c.id::text AS id, c.user_id::text AS user_id, c.title,
+           c.created_at, c.updated_at, c.is_active,
+           m.id::text AS message_id, m.role, m.content,
+           NULLIF(m.msg_metadata, '{{}}'::jsonb)::text AS metadata,
+           m.created_at AS message_created_at, m.token_count
+    FROM conversation_histories c
+    LEFT JOIN conversation_messages m ON m.conversation_id = c.id
+    WHERE c.id = {conversation}
+    ORDER BY m.created_at
+"""
+CONVERSATION_BY_ID_SQL = _CONVERSATION_JSON_SQL.format(conversation="$1")
+ACTIVE_CONVERSATION_SQL = _CONVERSATION_JSON_SQL.format(conversation="""(
+        SELECT id FROM conversation_histories
+        WHERE user_id = $1 AND is_active
+        ORDER BY updated_at DESC
+        LIMIT 1
+    )""")
+
+async def encode_conversation_with_messages(
+    db: AsyncSession,
+    sql: str,
+    arg
+) -> Optional[bytes]:
+    """Stream a conversation and its ordered messages into JSON bytes over the session's asyncpg connection"""
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    pg = raw_connection.driver_connection
+    
+    # Each message is encoded as its batch arrives, so only compact bytes
+    # outlive the batch; stored metadata JSON is embedded verbatim
+    header = None
+    encoded_messages = []
+    async with pg.transaction(readonly=True):
+        async for row in pg.cursor(sql, arg, prefetch=MESSAGE_STREAM_BATCH_SIZE):
+            if header is None:
+                header = orjson.dumps({
+                    "id": row["id"],
+                    "user_id": row["user_id"],
+                    "title": row["title"],
+                    "created_at": row["created_at"],
+                    "updated_at": row["updated_at"],
+                    "is_active": row["is_active"]
+                })
+            if row["message_id"] is not None:
+                metadata = row["metadata"]
+                encoded_messages.append(orjson.dumps({
+                    "id": row["message_id"],
+                    "role": row["role"],
+                    "content": row["content"],
+                    "metadata": orjson.Fragment(metadata) if metadata is not None else None,
+                    "created_at": row["message_created_at"],
+                    "token_count": row["token_count"]
+                }))
+    
+    if header is None:
+        return None
+    
+    return header[:-1] + b',"messages":[' + b",".join(encoded_messages) + b"]}"
+
 # Frontend compatibility endpoints (company mode only)
-@router.get("/conversations/active")
+@router.get("/conversations/active", response_class=ORJSONResponse)
 async def get_active_conversation(
     mode: str = "company",  # Only company mode supported
     db: AsyncSession = Depends(get_db)
@@ -58,52 +175,19 @@ async def get_active_conversation(
     
     try:
         # Look for existing active conversation for this user
-        result = await db.execute(
-            select(Conversation)
-            .where(Conversation.user_id == user_uuid)
-            .where(Conversation.is_active == True)
-            .order_by(Conversation.updated_at.desc())
-        )
-        conversation = result.scalar_one_or_none()
+        body = await encode_conversation_with_messages(db, ACTIVE_CONVERSATION_SQL, user_uuid)
         
-        if conversation:
-            # Get messages for this conversation
-            messages_result = await db.execute(
-                select(Message)
-                .where(Message.conversation_id == conversation.id)
-                .order_by(Message.created_at)
-            )
-            messages = messages_result.scalars().all()
-            
-            message_responses = [
-                MessageResponse(
-                    id=str(msg.id),
-                    role=msg.role,
-                    content=msg.content,
-                    metadata=msg.msg_metadata,
-                    created_at=msg.created_at,
-                    token_count=msg.token_count
-                )
-                for msg in messages
-            ]
-            
-            return ConversationWithMessages(
-                id=str(conversation.id),
-                user_id=str(conversation.user_id),
-                title=conversation.title,
-                created_at=conversation.created_at,
-                updated_at=conversation.updated_at,
-                is_active=conversation.is_active,
-                messages=message_responses
-            )
+        if body is not None:
+            return Response(content=body, media_type="application/json")
         
         # No active conversation found, return empty structure
+        now = datetime.now(timezone.utc).isoformat()
         return {
             "id": None,
             "user_id": str(user_uuid),
             "title": None,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
+            "created_at": now,
+            "updated_at": now,
             "is_active": False,
             "messages": []
         }
@@ -111,66 +195,78 @@ async def get_active_conversation(
     except Exception as e:
         print(f"Error in get_active_conversation: {e}")
         # Return empty structure on error
+        now = datetime.now(timezone.utc).isoformat()
         return {
             "id": None,
             "user_id": str(user_uuid),
             "title": None,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
+            "created_at": now,
+            "updated_at": now,
             "is_active": False,
             "messages": []
         }
 
-@router.post("/conversations/new")
+@router.post("/conversations/new", response_model=ConversationResponse)
 async def create_new_conversation(
     mode: str = "company",  # Only company mode supported
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    redis_client = Depends(get_redis)
 ):
     """Create a new conversation for company mode"""
     user_uuid = uuid.UUID("123e4567-e89b-12d3-a456-426614174000")
     
     try:
         # Deactivate any existing active conversations for this user
-        existing_convs_result = await db.execute(
-            select(Conversation)
+        deactivated = await db.execute(
+            update(Conversation)
             .where(Conversation.user_id == user_uuid)
             .where(Conversation.is_active == True)
+            .values(is_active=False)
+            .returning(Conversation.id)
         )
-        existing_convs = existing_convs_result.scalars().all()
-        for conv in existing_convs:
-            conv.is_active = False
+        deactivated_ids = deactivated.scalars().all()
         
         # Create new conversation
-        conversation_id = uuid.uuid4()
-        title = f"Flash AI Company Chat - {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
+        # Fields are set here and the server-generated id comes back via
+        # INSERT ... RETURNING, so no refresh SELECT is needed after commit
+        now = datetime.now(timezone.utc)
+        title = f"Flash AI Company Chat - {now.strftime('%Y-%m-%d %H:%M')}"
         
         conversation = Conversation(
-            id=conversation_id,
             user_id=user_uuid,
             title=title,
+            created_at=now,
+            updated_at=now,
             is_active=True
         )
         
         db.add(conversation)
         await db.commit()
-        await db.refresh(conversation)
         
-        return ConversationResponse(
-            id=str(conversation.id),
-            user_id=str(conversation.user_id),
-            title=conversation.title,
-            created_at=conversation.created_at,
-            updated_at=conversation.updated_at,
-            is_active=conversation.is_active,
-            message_count=0
-        )
+        # Cached copies of the deactivated conversations still say is_active=true
+        await invalidate_conversation_cache(redis_client, *deactivated_ids)
+        await bump_user_list_version(redis_client, user_uuid)
+        
+        return ORJSONResponse(conversation_summary(conversation, 0))
         
     except Exception as e:
         print(f"Error in create_new_conversation: {e}")
         raise HTTPException(status_code=500, detail="Failed to create conversation")
 
 from fastapi.responses import StreamingResponse
-import asyncio
+
+def _sse_frame(payload: Dict[str, Any]) -> bytes:
+    """Encode one server-sent event frame"""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+# Constant frames, encoded once at import
+_SSE_THINKING_FRAMES = (
+    _sse_frame({'type': 'thinking', 'content': 'Processing your Flash team request...'})
+    + _sse_frame({'type': 'thinking', 'content': 'Analyzing request intent and context...'})
+)
+_SSE_DONE = _sse_frame({'type': 'done'})
+_SSE_NO_QUERY = _sse_frame({'type': 'error', 'content': 'No query provided'})
+_SSE_FAILED = _sse_frame({'type': 'error', 'content': 'Failed to process request. Please try again.'})
 
 @router.post("/chat/stream")
 async def stream_chat(
@@ -189,144 +285,284 @@ async def stream_chat(
             print(f"Stream request: query='{message}', conversation_id='{conversation_id}'")
             
             if not message.strip():
-                yield f"data: {json.dumps({'type': 'error', 'content': 'No query provided'})}\n\n"
+                yield _SSE_NO_QUERY
                 return
             
             # Step 1: Basic processing
-            yield f"data: {json.dumps({'type': 'thinking', 'content': 'Processing your Flash team request...'})}\n\n"
-            await asyncio.sleep(0.2)
-            
-            yield f"data: {json.dumps({'type': 'thinking', 'content': 'Analyzing request intent and context...'})}\n\n"
-            await asyncio.sleep(0.2)
+            yield _SSE_THINKING_FRAMES
             
             # Simple response for now - gradually add complexity
             response_content = f"Thank you for your Flash team question: '{message}'. I've processed your request and am providing a response using our AI orchestration system. The Intent AI and Quality Enhancement services are operational."
             
-            yield f"data: {json.dumps({'type': 'content', 'content': response_content, 'sources': [], 'confidence': 0.8})}\n\n"
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            yield _sse_frame({'type': 'content', 'content': response_content, 'sources': [], 'confidence': 0.8}) + _SSE_DONE
             
         except Exception as e:
             print(f"Error in generate_stream: {e}")
             import traceback
             traceback.print_exc()
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Failed to process request. Please try again.'})}\n\n"
+            yield _SSE_FAILED
+    
+    return StreamingResponse(
+        generate_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "Access-Control-Allow-Origin": "*",
+        }
+    )
+
+@router.post("/chat/reasoning/stream")
+async def stream_reasoning(
+    request: dict = Body(...),
+    db: AsyncSession = Depends(get_db),
+    redis_client = Depends(get_redis),
+    stream_redis = Depends(get_stream_redis)
+):
+    """Stream MCP ReAct steps and the final answer as newline-delimited JSON"""
+    query = request.get("query", "")
+    if not query.strip():
+        raise HTTPException(status_code=400, detail="No query provided")
 
+    service = StreamingAIService(db, redis_client, stream_redis)
+    # Frames are already orjson-encoded bytes; Starlette writes them as-is
+    return StreamingResponse(
+        service.process_query_with_reasoning(
+            query,
+            # Fixed user UUID for testing - TODO: Get from auth
+            request.get("user_id", "123e4567-e89b-12d3-a456-426614174000"),
+            mode=request.get("mode", "company"),
+            conversation_id=request.get("conversation_id")
+        ),
+        media_type="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        }
+    )
 
 async def call_ai_orchestrator(endpoint: str, data: dict) -> dict:
     """Helper function to call AI Orchestrator service"""
-    import httpx
     try:
-        ai_orchestrator_url = "http://ai-orchestrator:8003"
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(f"{ai_orchestrator_url}{endpoint}", json=data)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"AI Orchestrator error: {response.status_code} - {response.text}")
-                return {}
+        response = await ai_orchestrator_client.post(endpoint, json=data)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            print(f"AI Orchestrator error: {response.status_code} - {response.text}")
+            return {}
     except Exception as e:
         print(f"Error calling AI Orchestrator: {e}")
         return {}
 
 async def call_embedding_service(endpoint: str, data: dict) -> dict:
     """Helper function to call Embedding service"""
-    import httpx
     try:
-        embedding_url = "http://embedding:8002"
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(f"{embedding_url}{endpoint}", json=data)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Embedding service error: {response.status_code} - {response.text}")
-                return {}
+        response = await embedding_client.post(endpoint, json=data)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            print(f"Embedding service error: {response.status_code} - {response.text}")
+            return {}
     except Exception as e:
         print(f"Error calling Embedding service: {e}")
         return {}
-    
-    return StreamingResponse(
-        generate_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Access-Control-Allow-Origin": "*",
-        }
-    )
 
 # Original endpoints (kept for compatibility)
 @router.post("/conversations", response_model=ConversationResponse)
 async def create_conversation(
     conversation_data: ConversationCreate,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    redis_client = Depends(get_redis)
 ):
     """Create a new conversation"""
-    conversation_id = uuid.uuid4()
+    # Fields are set here and the server-generated id comes back via
+    # INSERT ... RETURNING, so no refresh SELECT is needed after commit
+    now = datetime.now(timezone.utc)
     
     conversation = Conversation(
-        id=conversation_id,
         user_id=uuid.UUID(conversation_data.user_id),
-        title=conversation_data.title or f"Conversation {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
+        title=conversation_data.title or f"Conversation {now.strftime('%Y-%m-%d %H:%M')}",
+        created_at=now,
+        updated_at=now,
+        is_active=True
     )
     
     db.add(conversation)
     await db.commit()
-    await db.refresh(conversation)
+    await bump_user_list_version(redis_client, conversation.user_id)
     
-    return ConversationResponse(
-        id=str(conversation.id),
-        user_id=str(conversation.user_id),
-        title=conversation.title,
-        created_at=conversation.created_at,
-        updated_at=conversation.updated_at,
-        is_active=conversation.is_active,
-        message_count=0
+    return ORJSONResponse(conversation_summary(conversation, 0))
+
+# Touch the parent conversation and insert the message in one statement; the
+# INSERT selects from the UPDATE's RETURNING, so a missing conversation
+# inserts nothing and comes back as zero rows.
+_ADD_MESSAGE_SQL = text("""
+    WITH touched AS (
+        UPDATE conversation_histories
+        SET updated_at = now()
+        WHERE id = :conversation_id
+        RETURNING id, user_id
     )
+    INSERT INTO conversation_messages
+        (conversation_id, role, content, msg_metadata, token_count, created_at)
+    SELECT touched.id, CAST(:role AS VARCHAR), CAST(:content AS TEXT),
+           CAST(:metadata AS JSONB), CAST(:token_count AS INTEGER), now()
+    FROM touched
+    RETURNING id, created_at, (SELECT user_id FROM touched) AS user_id
+""")
 
-@router.get("/conversations/{conversation_id}", response_model=ConversationWithMessages)
-async def get_conversation(
+@router.post("/conversations/{conversation_id}/messages", response_model=MessageResponse)
+async def add_message(
     conversation_id: str,
-    db: AsyncSession = Depends(get_db)
+    message_data: MessageCreate,
+    db: AsyncSession = Depends(get_db),
+    redis_client = Depends(get_redis)
 ):
-    """Get a conversation with all its messages"""
-    # Get conversation
+    """Append a message to a conversation"""
+    conversation_uuid = uuid.UUID(conversation_id)
+    metadata = message_data.metadata or {}
+    token_count = len(TOKEN_ENCODING.encode_ordinary(message_data.content))
+    
+    result = await db.execute(_ADD_MESSAGE_SQL, {
+        "conversation_id": conversation_uuid,
+        "role": message_data.role,
+        "content": message_data.content,
+        "metadata": orjson.dumps(metadata).decode(),
+        "token_count": token_count
+    })
+    row = result.first()
+    
+    if row is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    await db.commit()
+    await invalidate_conversation_cache(redis_client, conversation_uuid)
+    # updated_at moved, so the user's list order may have changed
+    await bump_user_list_version(redis_client, row.user_id)
+    
+    return ORJSONResponse({
+        "id": row.id,
+        "role": message_data.role,
+        "content": message_data.content,
+        "metadata": metadata,
+        "created_at": row.created_at,
+        "token_count": token_count
+    })
+
+@router.get("/conversations/user/{user_id}", response_model=List[ConversationResponse])
+async def get_user_conversations(
+    user_id: str,
+    limit: int = 50,
+    offset: int = 0,
+    db: AsyncSession = Depends(get_db),
+    redis_client = Depends(get_redis)
+):
+    """List a user's conversations, most recently active first"""
+    user_uuid = uuid.UUID(user_id)
+    
+    # Page keys embed the user's list version, so a write invalidates every
+    # page with one INCR instead of a SCAN over ulist:{user}:*
+    cache_key = None
+    try:
+        version = await redis_client.get(user_list_version_key(user_uuid))
+        cache_key = f"ulist:{user_uuid}:v{int(version or 0)}:{limit}:{offset}"
+        cached = await redis_client.get(cache_key)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+    except Exception as e:
+        print(f"User list cache read failed: {e}")
+    
+    # One query for the page and its message counts: the (user_id, updated_at)
+    # index serves the ordering, and the outer join counts 0 for empty conversations
     result = await db.execute(
-        select(Conversation).where(Conversation.id == uuid.UUID(conversation_id))
+        select(
+            Conversation.id,
+            Conversation.user_id,
+            Conversation.title,
+            Conversation.created_at,
+            Conversation.updated_at,
+            Conversation.is_active,
+            func.count(Message.id).label("message_count")
+        )
+        .outerjoin(Message, Message.conversation_id == Conversation.id)
+        .where(Conversation.user_id == user_uuid)
+        .group_by(Conversation.id)
+        .order_by(Conversation.updated_at.desc())
+        .limit(limit)
+        .offset(offset)
     )
-    conversation = result.scalar_one_or_none()
     
-    if not conversation:
+    body = orjson.dumps([conversation_summary(row, row.message_count) for row in result])
+    
+    if cache_key is not None:
+        try:
+            await redis_client.set(cache_key, body, ex=settings.USER_LIST_CACHE_TTL)
+        except Exception as e:
+            print(f"User list cache write failed: {e}")
+    
+    return Response(content=body, media_type="application/json")
+
+@router.get(
+    "/conversations/{conversation_id}",
+    response_model=ConversationWithMessages,
+    response_class=ORJSONResponse
+)
+async def get_conversation(
+    conversation_id: str,
+    db: AsyncSession = Depends(get_db),
+    redis_client = Depends(get_redis)
+):
+    """Get a conversation with all its messages"""
+    conversation_uuid = uuid.UUID(conversation_id)
+    cache_key = conversation_cache_key(conversation_uuid)
+    
+    # Read-through cache; Redis failures fall back to the database
+    try:
+        cached = await redis_client.get(cache_key)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+    except Exception as e:
+        print(f"Conversation cache read failed: {e}")
+    
+    # Get conversation together with its messages
+    body = await encode_conversation_with_messages(db, CONVERSATION_BY_ID_SQL, conversation_uuid)
+    
+    if body is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    # Get messages
-    messages_result = await db.execute(
-        select(Message)
-        .where(Message.conversation_id == uuid.UUID(conversation_id))
-        .order_by(Message.created_at)
-    )
-    messages = messages_result.scalars().all()
+    try:
+        await redis_client.set(cache_key, body, ex=settings.CONVERSATION_CACHE_TTL)
+    except Exception as e:
+        print(f"Conversation cache write failed: {e}")
     
-    message_responses = [
-        MessageResponse(
-            id=str(msg.id),
-            role=msg.role,
-            content=msg.content,
-            metadata=msg.metadata,
-            created_at=msg.created_at,
-            token_count=msg.token_count
-        )
-        for msg in messages
-    ]
+    return Response(content=body, media_type="application/json")
+
+@router.delete("/conversations/{conversation_id}")
+async def delete_conversation(
+    conversation_id: str,
+    db: AsyncSession = Depends(get_db),
+    redis_client = Depends(get_redis)
+):
+    """Delete a conversation; its messages are removed by ON DELETE CASCADE"""
+    conversation_uuid = uuid.UUID(conversation_id)
     
-    return ConversationWithMessages(
-        id=str(conversation.id),
-        user_id=str(conversation.user_id),
-        title=conversation.title,
-        created_at=conversation.created_at,
-        updated_at=conversation.updated_at,
-        is_active=conversation.is_active,
-        messages=message_responses
+    result = await db.execute(
+        delete(Conversation)
+        .where(Conversation.id == conversation_uuid)
+        .returning(Conversation.user_id)
     )
+    user_id = result.scalar_one_or_none()
+    
+    if user_id is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    await db.commit()
+    await invalidate_conversation_cache(redis_client, conversation_uuid)
+    await bump_user_list_version(redis_client, user_id)
+    
+    return {"message": "Conversation deleted", "conversation_id": conversation_id}
 
 @router.get("/stats")
 async def get_conversation_stats(
@@ -334,19 +570,18 @@ async def get_conversation_stats(
 ):
     """Get conversation service statistics"""
     try:
-        # Get conversation count
-        conv_result = await db.execute(select(Conversation.id))
-        conversation_count = len(conv_result.scalars().all())
+        # Conversation totals (all + active) in a single aggregate
+        conv_result = await db.execute(
+            select(
+                func.count(),
+                func.count().filter(Conversation.is_active == True)
+            ).select_from(Conversation)
+        )
+        conversation_count, active_count = conv_result.one()
         
         # Get message count
-        msg_result = await db.execute(select(Message.id))
-        message_count = len(msg_result.scalars().all())
-        
-        # Get active conversations
-        active_result = await db.execute(
-            select(Conversation.id).where(Conversation.is_active == True)
-        )
-        active_count = len(active_result.scalars().all())
+        msg_result = await db.execute(select(func.count()).select_from(Message))
+        message_count = msg_result.scalar_one()
         
         return {
             "total_conversations": conversation_count,
@@ -1,18 +1,48 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import String, Text, DateTime, Integer, Boolean, ForeignKey
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy import String, Text, DateTime, Integer, Boolean, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from datetime import datetime
 import uuid
-from typing import AsyncGenerator
+from typing import AsyncGenerator, List, Optional, Any
 import redis.asyncio as redis
+import httpx
+import orjson
+from fastapi import Request
 from core.config import settings
 
 # Database setup
+# asyncpg keeps prepared statements per connection (statement_cache_size) and
+# SQLAlchemy keeps its own cache of those handles (prepared_statement_cache_size);
+# both must be off behind a transaction-pooling PgBouncer
+if settings.DB_BEHIND_PGBOUNCER:
+    _connect_args = {
+        "server_settings": {"jit": "off"},
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0
+    }
+else:
+    _connect_args = {
+        # Let the server notice dead clients (killed pods) within ~a minute
+        "server_settings": {"tcp_keepalives_idle": str(settings.DB_TCP_KEEPALIVES_IDLE)},
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE
+    }
+
+# create_async_engine pools with AsyncAdaptedQueuePool over asyncpg
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=False,
-    future=True
+    future=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    connect_args=_connect_args,
+    # JSON/JSONB columns encode and decode through orjson instead of stdlib json
+    json_serializer=lambda obj: orjson.dumps(obj).decode(),
+    json_deserializer=orjson.loads
 )
 
 async_session_maker = async_sessionmaker(
@@ -21,16 +51,34 @@ async_session_maker = async_sessionmaker(
     expire_on_commit=False
 )
 
-# Redis setup
-redis_client = redis.from_url(settings.REDIS_URL)
+# Shared keep-alive HTTP clients for downstream services
+_http_limits = httpx.Limits(
+    max_connections=settings.HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS
+)
+_http_timeout = httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+ai_orchestrator_client = httpx.AsyncClient(
+    base_url=settings.AI_ORCHESTRATOR_URL,
+    timeout=_http_timeout,
+    limits=_http_limits
+)
+embedding_client = httpx.AsyncClient(
+    base_url=settings.EMBEDDING_SERVICE_URL,
+    timeout=_http_timeout,
+    limits=_http_limits
+)
 
 class Base(DeclarativeBase):
     pass
 
 class Conversation(Base):
     __tablename__ = "conversation_histories"
+    __table_args__ = (
+        # Per-user listings ordered by recent activity
+        Index("idx_conversation_histories_user_updated", "user_id", "updated_at"),
+    )
     
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
     title: Mapped[str] = mapped_column(String(255), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
@@ -38,19 +86,28 @@ class Conversation(Base):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     conv_metadata: Mapped[dict] = mapped_column(JSONB, default=dict)
     
+    # Messages in chronological order; the FK cascade removes them on delete
+    messages: Mapped[List["Message"]] = relationship(order_by="Message.created_at", passive_deletes=True)
+    
 class Message(Base):
     __tablename__ = "conversation_messages"
+    __table_args__ = (
+        # A conversation's messages in order, without a sort step
+        Index("idx_conversation_messages_conversation_created", "conversation_id", "created_at"),
+        # Containment lookups on message metadata (msg_metadata @> '{...}')
+        Index("idx_conversation_messages_metadata_gin", "msg_metadata", postgresql_using="gin"),
+    )
     
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    conversation_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("conversation_histories.id"), nullable=False)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+    conversation_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("conversation_histories.id", ondelete="CASCADE"), nullable=False)
     role: Mapped[str] = mapped_column(String(20), nullable=False)  # 'user' or 'assistant'
     content: Mapped[str] = mapped_column(Text, nullable=False)
     msg_metadata: Mapped[dict] = mapped_column(JSONB, default=dict)  # JSON object
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
     token_count: Mapped[int] = mapped_column(Integer, default=0)
-    sources: Mapped[str] = mapped_column(Text, nullable=True)  # JSON string for sources
+    sources: Mapped[Optional[List[Any]]] = mapped_column(JSONB, nullable=True)  # Documentation sources
     confidence: Mapped[float] = mapped_column(nullable=True)  # Confidence score
-    thinking_steps: Mapped[str] = mapped_column(Text, nullable=True)  # JSON array of thinking steps
+    thinking_steps: Mapped[Optional[List[Any]]] = mapped_column(JSONB, nullable=True)  # Thinking steps
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Get database session"""
@@ -65,6 +122,39 @@ async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
-async def get_redis():
-    """Get Redis client"""
-    return redis_client 
\ No newline at end of file
+async def close_http_clients():
+    """Close shared HTTP clients on shutdown"""
+    await ai_orchestrator_client.aclose()
+    await embedding_client.aclose()
+
+def create_redis_client() -> redis.Redis:
+    """Create the process-wide Redis client with a bounded connection pool"""
+    return redis.from_url(
+        settings.REDIS_URL,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_keepalive=True
+    )
+
+def create_stream_redis_client() -> redis.Redis:
+    """
+    Create the Redis client for reasoning streams. Each in-flight stream holds
+    two connections for its whole life (a blocking XREAD and a pubsub
+    subscription), so these come from their own pool and wait for a free
+    connection instead of starving the shared client.
+    """
+    pool = redis.BlockingConnectionPool.from_url(
+        settings.REDIS_URL,
+        max_connections=settings.REDIS_STREAM_MAX_CONNECTIONS,
+        timeout=settings.REDIS_STREAM_POOL_TIMEOUT,
+        socket_keepalive=True
+    )
+    # The client owns the pool, so aclose() also disconnects it
+    return redis.Redis.from_pool(pool)
+
+def get_redis(request: Request) -> redis.Redis:
+    """Get the Redis client created in the app lifespan"""
+    return request.app.state.redis
+
+def get_stream_redis(request: Request) -> redis.Redis:
+    """Get the reasoning-stream Redis client created in the app lifespan"""
+    return request.app.state.stream_redis
@@ -1,9 +1,35 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 import uvicorn
+from contextlib import asynccontextmanager
 from core.config import settings
-from core.database import init_db
+from core.database import init_db, close_http_clients, create_redis_client, create_stream_redis_client
 from api.routes import router
+from services.streaming_ai import drain_background_tasks
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZip responses except server-sent event streams, which must reach the client frame by frame"""
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the Redis pools and database setup for the app's lifetime"""
+    app.state.redis = create_redis_client()
+    app.state.stream_redis = create_stream_redis_client()
+    await init_db()
+    yield
+    # Finish pending turn saves, then release pooled HTTP and Redis connections
+    await drain_background_tasks()
+    await close_http_clients()
+    await app.state.redis.aclose()
+    await app.state.stream_redis.aclose()
 
 # Create FastAPI app
 app = FastAPI(
@@ -11,7 +37,9 @@ app = FastAPI(
     description="🐄 Persistent conversation management and chat history",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -23,6 +51,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON bodies (full conversations, list pages)
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024)
+
 # Include API routes
 app.include_router(router)
 
@@ -36,15 +67,12 @@ async def health_check():
         "message": "Conversation service ready for chat history management"
     }
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database on startup"""
-    await init_db()
-
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8001,
+        loop="uvloop",
+        http="httptools",
         reload=True
     ) 
\ No newline at end of file
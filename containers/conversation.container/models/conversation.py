@@ -1,10 +1,11 @@
-from sqlalchemy import Column, String, Text, Boolean, Integer, Float, DateTime, JSON, ForeignKey
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, String, Text, Boolean, Integer, Float, DateTime, JSON, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
 
-Base = declarative_base()
+# Share the service's declarative base so there is one registry, one
+# MetaData and one engine for every conversation table
+from core.database import Base
 
 class TimestampMixin:
     """Mixin for automatic timestamp management"""
@@ -17,7 +18,13 @@ class Conversation(Base, TimestampMixin):
     Supports persistent chat sessions with rich metadata.
     """
     __tablename__ = "conversation"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # list_user_conversations: user_id [+ mode] ORDER BY updated_at DESC
+        Index("ix_conversation_user_updated", "user_id", "updated_at"),
+        # get_or_create_active_conversation: user_id = ? AND mode = ? AND is_active
+        Index("ix_conversation_user_mode_active", "user_id", "mode", postgresql_where=text("is_active")),
+        {"schema": "public"},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     conversation_id = Column(String, unique=True, nullable=False, index=True)
@@ -30,7 +37,7 @@ class Conversation(Base, TimestampMixin):
     total_tokens = Column(Integer, nullable=True)  # For analytics
 
     # Relationship to messages
-    messages = relationship("ConversationMessage", back_populates="conversation", cascade="all, delete-orphan")
+    messages = relationship("ConversationMessage", back_populates="conversation", cascade="all, delete-orphan", passive_deletes=True)
 
     def __init__(self, **kwargs):
         if 'conversation_id' not in kwargs:
@@ -46,10 +53,14 @@ class ConversationMessage(Base, TimestampMixin):
     Supports thinking steps, sources, confidence scores, and performance metrics.
     """
     __tablename__ = "conversation_message"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # get_conversation_messages: conversation_id = ? ORDER BY created_at
+        Index("ix_conversation_message_conversation_created", "conversation_id", "created_at"),
+        {"schema": "public"},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    conversation_id = Column(String, ForeignKey('public.conversation.conversation_id'), nullable=False)
+    conversation_id = Column(String, ForeignKey('public.conversation.conversation_id', ondelete='CASCADE'), nullable=False)
     role = Column(String, nullable=False)  # "user" or "assistant"
     content = Column(Text, nullable=False)
     mode = Column(String, nullable=True)  # Mode when message was created
@@ -62,7 +73,8 @@ class ConversationMessage(Base, TimestampMixin):
     response_time_ms = Column(Integer, nullable=True)  # Performance metrics
 
     # Relationship to conversation
-    conversation = relationship("Conversation", back_populates="messages")
+    # Class reference, not a string: core.database maps another "Conversation"
+    conversation = relationship(Conversation, back_populates="messages")
 
     def __repr__(self):
         return f"<ConversationMessage(id={self.id}, role={self.role}, conversation={self.conversation_id})>"
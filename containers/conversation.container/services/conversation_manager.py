@@ -1,24 +1,129 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Mapping, Optional, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, and_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update, delete, insert, and_, or_, case, text, true
+from collections import Counter
 import uuid
 import logging
+import orjson
 from datetime import datetime
 
-from ..core.database import get_db_session
-from ..models.conversation import Conversation, ConversationMessage
+from core.database import async_session_maker
+from models.conversation import Conversation, ConversationMessage
 
 logger = logging.getLogger(__name__)
 
+# Bulk message writes above this size go through COPY instead of a multi-row INSERT
+BULK_COPY_THRESHOLD = 100
+
+# Column order for COPY; JSON columns are sent pre-encoded
+_BULK_MESSAGE_COLUMNS = (
+    "conversation_id", "role", "content", "mode", "sources", "confidence",
+    "thinking_steps", "token_count", "response_time_ms", "created_at", "updated_at"
+)
+_BULK_JSON_COLUMNS = frozenset(("sources", "thinking_steps"))
+
+# Message fields read back by the history/context paths; selected as plain
+# columns so rows come back as mappings without ORM instance hydration
+_MESSAGE_READ_COLUMNS = (
+    ConversationMessage.id,
+    ConversationMessage.role,
+    ConversationMessage.content,
+    ConversationMessage.mode,
+    ConversationMessage.sources,
+    ConversationMessage.confidence,
+    ConversationMessage.thinking_steps,
+    ConversationMessage.created_at,
+    ConversationMessage.token_count,
+    ConversationMessage.response_time_ms
+)
+
+# Recent messages mirrored per conversation in Redis (hist:{conversation_id})
+HISTORY_CACHE_SIZE = 50
+HISTORY_CACHE_TTL = 86400  # idle conversations drop out of Redis after a day
+
+# get_or_create_active_conversation in one statement. Exactly one branch yields
+# a row: the requested conversation (switched active), else the user's active
+# conversation in the mode, else a freshly inserted one. When nothing is active
+# in the mode there is nothing to deactivate before the insert.
+_GET_OR_CREATE_ACTIVE_SQL = text("""
+    WITH requested AS (
+        SELECT id FROM public.conversation
+        WHERE conversation_id = :conversation_id AND user_id = :user_id
+    ),
+    switched AS (
+        UPDATE public.conversation
+        SET is_active = (conversation_id = :conversation_id),
+            updated_at = CASE WHEN conversation_id = :conversation_id
+                              THEN now() AT TIME ZONE 'utc' ELSE updated_at END
+        WHERE EXISTS (SELECT 1 FROM requested)
+          AND user_id = :user_id
+          AND (mode = :mode OR conversation_id = :conversation_id)
+        RETURNING *
+    ),
+    active AS (
+        SELECT * FROM public.conversation
+        WHERE NOT EXISTS (SELECT 1 FROM requested)
+          AND user_id = :user_id AND mode = :mode AND is_active
+        ORDER BY updated_at DESC
+        LIMIT 1
+    ),
+    created AS (
+        INSERT INTO public.conversation
+            (conversation_id, user_id, mode, title, is_active, message_count, created_at, updated_at)
+        SELECT CAST(:new_conversation_id AS VARCHAR), CAST(:user_id AS VARCHAR),
+               CAST(:mode AS VARCHAR), CAST(:title AS VARCHAR), true, 0,
+               now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc'
+        WHERE NOT EXISTS (SELECT 1 FROM requested)
+          AND NOT EXISTS (SELECT 1 FROM active)
+        RETURNING *
+    )
+    SELECT * FROM switched WHERE conversation_id = :conversation_id
+    UNION ALL
+    SELECT * FROM active
+    UNION ALL
+    SELECT * FROM created
+""")
+
+# Prompt context for the last :limit messages, built server-side in one
+# statement. Same layout as the former Python loop: truncated content, a
+# source count on assistant turns, other roles skipped. sources may hold a
+# JSON null, so its length is only taken when it is an array.
+_CONTEXT_SUMMARY_SQL = text("""
+    SELECT string_agg(
+        CASE role
+            WHEN 'user' THEN 'User: ' || left(content, 200) || '...'
+            WHEN 'assistant' THEN 'Assistant: ' || left(content, 300)
+                || CASE WHEN coalesce(json_array_length(
+                            CASE WHEN json_typeof(sources) = 'array' THEN sources END
+                        ), 0) > 0
+                        THEN ' [Sources: ' || json_array_length(sources) || ' docs]'
+                        ELSE '' END
+                || '...'
+        END,
+        E'\\n' ORDER BY created_at
+    )
+    FROM (
+        SELECT role, content, sources, created_at
+        FROM public.conversation_message
+        WHERE conversation_id = :conversation_id
+        ORDER BY created_at DESC
+        LIMIT :limit
+    ) recent
+""")
+
 class ConversationManager:
     """
     Production-ready conversation management system extracted from legacy.
     Handles conversation lifecycle, message persistence, and context management.
     """
 
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, redis_client=None):
         self.db = db
+        # Optional; mirrors recent messages per conversation when set
+        self.redis_client = redis_client
+        # Messages staged since the last flush_turn(), and their count per conversation
+        self._pending_messages: List[ConversationMessage] = []
+        self._pending_counts: Dict[str, int] = {}
 
     async def get_or_create_active_conversation(
         self, 
@@ -31,58 +136,47 @@ class ConversationManager:
         Preserves legacy behavior for conversation continuity.
         """
         try:
-            # If conversation_id provided, try to get it
-            if conversation_id:
-                result = await self.db.execute(
-                    select(Conversation).where(
-                        and_(
-                            Conversation.conversation_id == conversation_id,
-                            Conversation.user_id == user_id
-                        )
-                    )
-                )
-                conversation = result.scalars().first()
-                if conversation:
-                    # Mark as active and return
-                    await self._mark_conversation_active(conversation_id, user_id, mode)
-                    return conversation
-
-            # Find existing active conversation for user and mode
             result = await self.db.execute(
-                select(Conversation).where(
-                    and_(
-                        Conversation.user_id == user_id,
-                        Conversation.mode == mode,
-                        Conversation.is_active == True
-                    )
-                )
+                select(Conversation).from_statement(_GET_OR_CREATE_ACTIVE_SQL),
+                {
+                    "conversation_id": conversation_id,
+                    "user_id": user_id,
+                    "mode": mode,
+                    "new_conversation_id": str(uuid.uuid4()),
+                    "title": self._default_title(mode)
+                }
             )
-            active_conversation = result.scalars().first()
-
-            if active_conversation:
-                logger.info(f"Found active conversation {active_conversation.conversation_id} for user {user_id}")
-                return active_conversation
+            conversation = result.scalars().one()
+            await self.db.commit()
 
-            # Create new conversation
-            return await self.create_conversation(user_id, mode)
+            logger.info(f"Using conversation {conversation.conversation_id} for user {user_id}")
+            return conversation
 
         except Exception as e:
             logger.error(f"Error getting/creating conversation: {str(e)}")
+            await self.db.rollback()
             # Fallback: create new conversation
             return await self.create_conversation(user_id, mode)
 
+    @staticmethod
+    def _default_title(mode: str) -> str:
+        """Flash-branded title for a new conversation"""
+        return f"Flash {'Team' if mode == 'company' else 'General'} Chat"
+
     async def create_conversation(self, user_id: str, mode: str, title: Optional[str] = None) -> Conversation:
         """Create new conversation with Flash AI branding"""
         try:
             conversation_id = str(uuid.uuid4())
             
-            # Mark existing conversations as inactive for this user/mode
+            # Mark existing conversations as inactive for this user/mode;
+            # same transaction and commit as the insert below
             await self.db.execute(
                 update(Conversation)
                 .where(
                     and_(
                         Conversation.user_id == user_id,
-                        Conversation.mode == mode
+                        Conversation.mode == mode,
+                        Conversation.is_active == True
                     )
                 )
                 .values(is_active=False)
@@ -93,14 +187,13 @@ class ConversationManager:
                 conversation_id=conversation_id,
                 user_id=user_id,
                 mode=mode,
-                title=title or f"Flash {'Team' if mode == 'company' else 'General'} Chat",
+                title=title or self._default_title(mode),
                 is_active=True,
                 message_count=0
             )
 
             self.db.add(new_conversation)
             await self.db.commit()
-            await self.db.refresh(new_conversation)
 
             logger.info(f"Created new conversation {conversation_id} for user {user_id} in {mode} mode")
             return new_conversation
@@ -127,7 +220,7 @@ class ConversationManager:
         Extracted from legacy conversation system.
         """
         try:
-            message = ConversationMessage(
+            message = self.save_message_nocommit(
                 conversation_id=conversation_id,
                 role=role,
                 content=content,
@@ -138,27 +231,201 @@ class ConversationManager:
                 token_count=token_count,
                 response_time_ms=response_time_ms
             )
+            await self.flush_turn()
 
-            self.db.add(message)
+            logger.debug(f"Saved {role} message to conversation {conversation_id}")
+            return message
 
-            # Update conversation message count and last activity
+        except Exception as e:
+            logger.error(f"Error saving message: {str(e)}")
+            await self.db.rollback()
+            raise
+
+    def save_message_nocommit(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        mode: Optional[str] = None,
+        sources: Optional[List[Dict]] = None,
+        confidence: Optional[float] = None,
+        thinking_steps: Optional[List[Dict]] = None,
+        token_count: Optional[int] = None,
+        response_time_ms: Optional[int] = None
+    ) -> ConversationMessage:
+        """
+        Stage a message without a round trip.
+        The INSERT and the conversation counter update are written by flush_turn().
+        """
+        message = ConversationMessage(
+            conversation_id=conversation_id,
+            role=role,
+            content=content,
+            mode=mode,
+            sources=sources,
+            confidence=confidence,
+            thinking_steps=thinking_steps,
+            token_count=token_count,
+            response_time_ms=response_time_ms
+        )
+
+        self._pending_messages.append(message)
+        self._pending_counts[conversation_id] = self._pending_counts.get(conversation_id, 0) + 1
+        return message
+
+    async def flush_turn(self) -> None:
+        """
+        Write staged messages and their counter updates in a single commit.
+        The session is built with expire_on_commit=False, so no refresh is needed.
+        """
+        if not self._pending_counts:
+            return
+
+        pending, self._pending_counts = self._pending_counts, {}
+        messages, self._pending_messages = self._pending_messages, []
+        self.db.add_all(messages)
+        now = datetime.utcnow()
+        for conversation_id, count in pending.items():
+            # Autoflushes the staged INSERTs into the same transaction
             await self.db.execute(
                 update(Conversation)
                 .where(Conversation.conversation_id == conversation_id)
                 .values(
-                    message_count=Conversation.message_count + 1,
-                    updated_at=datetime.utcnow()
+                    message_count=Conversation.message_count + count,
+                    updated_at=now
                 )
             )
 
+        await self.db.commit()
+        await self._push_history(messages)
+
+    async def flush_turn_detached(self) -> None:
+        """
+        Write the staged turn on a session of its own.
+        Safe to run as a background task after the request's session has closed.
+        """
+        if not self._pending_counts:
+            return
+        async with async_session_maker() as session:
+            manager = ConversationManager(session, self.redis_client)
+            manager._pending_messages, self._pending_messages = self._pending_messages, []
+            manager._pending_counts, self._pending_counts = self._pending_counts, {}
+            await manager.flush_turn()
+
+    @staticmethod
+    def _history_key(conversation_id: str) -> str:
+        """Redis list of a conversation's most recent messages, newest first"""
+        return f"hist:{conversation_id}"
+
+    async def _push_history(self, messages: List[ConversationMessage]) -> None:
+        """Mirror committed messages into their conversations' Redis history lists"""
+        if not self.redis_client or not messages:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for conversation_id in {message.conversation_id for message in messages}:
+                key = self._history_key(conversation_id)
+                pipe.lpush(key, *(
+                    orjson.dumps(message.to_dict())
+                    for message in messages
+                    if message.conversation_id == conversation_id
+                ))
+                pipe.ltrim(key, 0, HISTORY_CACHE_SIZE - 1)
+                pipe.expire(key, HISTORY_CACHE_TTL)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"History cache update failed: {e}")
+
+    async def _drop_history(self, *conversation_ids: str) -> None:
+        """Forget cached history after writes that bypass _push_history"""
+        if not self.redis_client or not conversation_ids:
+            return
+        try:
+            await self.redis_client.delete(*(self._history_key(cid) for cid in conversation_ids))
+        except Exception as e:
+            logger.warning(f"History cache invalidation failed: {e}")
+
+    async def _cached_history(self, conversation_id: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Most recent `limit` messages from Redis in chronological order, or None when not fully cached"""
+        if not self.redis_client or limit > HISTORY_CACHE_SIZE:
+            return None
+        try:
+            entries = await self.redis_client.lrange(self._history_key(conversation_id), 0, limit - 1)
+        except Exception as e:
+            logger.warning(f"History cache read failed: {e}")
+            return None
+        if len(entries) < limit:
+            return None
+
+        messages = []
+        for entry in reversed(entries):
+            data = orjson.loads(entry)
+            timestamp = data.pop("timestamp")
+            data["created_at"] = datetime.fromisoformat(timestamp) if timestamp else None
+            messages.append(data)
+        return messages
+
+    async def save_messages_bulk(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert many messages at once (history backfill, imports) and bump counters.
+        Rows are dicts of ConversationMessage fields; returns the number inserted.
+        """
+        if not rows:
+            return 0
+
+        now = datetime.utcnow()
+        records = [
+            {
+                **{column: None for column in _BULK_MESSAGE_COLUMNS},
+                **row,
+                "created_at": row.get("created_at") or now,
+                "updated_at": now
+            }
+            for row in rows
+        ]
+        counts = Counter(record["conversation_id"] for record in records)
+
+        try:
+            # Counter updates first: they open the transaction the COPY joins
+            for conversation_id, count in counts.items():
+                await self.db.execute(
+                    update(Conversation)
+                    .where(Conversation.conversation_id == conversation_id)
+                    .values(
+                        message_count=Conversation.message_count + count,
+                        updated_at=now
+                    )
+                )
+
+            if len(records) > BULK_COPY_THRESHOLD:
+                connection = await self.db.connection()
+                raw_connection = await connection.get_raw_connection()
+                await raw_connection.driver_connection.copy_records_to_table(
+                    ConversationMessage.__tablename__,
+                    schema_name="public",
+                    columns=_BULK_MESSAGE_COLUMNS,
+                    records=[
+                        tuple(
+                            orjson.dumps(record[column]).decode()
+                            if column in _BULK_JSON_COLUMNS and record[column] is not None
+                            else record[column]
+                            for column in _BULK_MESSAGE_COLUMNS
+                        )
+                        for record in records
+                    ]
+                )
+            else:
+                # executemany form: SQLAlchemy batches it as multi-row INSERTs
+                await self.db.execute(insert(ConversationMessage), records)
+
             await self.db.commit()
-            await self.db.refresh(message)
+            await self._drop_history(*counts)
 
-            logger.debug(f"Saved {role} message to conversation {conversation_id}")
-            return message
+            logger.info(f"Bulk saved {len(records)} messages across {len(counts)} conversations")
+            return len(records)
 
         except Exception as e:
-            logger.error(f"Error saving message: {str(e)}")
+            logger.error(f"Error bulk saving messages: {str(e)}")
             await self.db.rollback()
             raise
 
@@ -167,22 +434,31 @@ class ConversationManager:
         conversation_id: str, 
         limit: Optional[int] = None,
         user_id: Optional[str] = None
-    ) -> List[ConversationMessage]:
+    ) -> List[Mapping[str, Any]]:
         """
         Get conversation messages with optional user validation.
-        Optimized for conversation context retrieval.
+        Optimized for conversation context retrieval: rows are read-only
+        mappings of message fields, not ORM instances.
         """
         try:
-            query = select(ConversationMessage).where(
+            if limit:
+                # Recent turns are normally served from the Redis mirror
+                cached = await self._cached_history(conversation_id, limit)
+                if cached is not None:
+                    return cached
+
+            query = select(*_MESSAGE_READ_COLUMNS).where(
                 ConversationMessage.conversation_id == conversation_id
-            ).order_by(ConversationMessage.created_at.asc())
+            )
 
             if limit:
                 # Get most recent messages
                 query = query.order_by(ConversationMessage.created_at.desc()).limit(limit)
+            else:
+                query = query.order_by(ConversationMessage.created_at.asc())
 
             result = await self.db.execute(query)
-            messages = result.scalars().all()
+            messages = result.mappings().all()
 
             if limit:
                 # Reverse to chronological order
@@ -206,22 +482,34 @@ class ConversationManager:
         Legacy-compatible response format.
         """
         try:
-            # Verify conversation ownership
+            # Ownership check and the latest `limit` messages in one round trip:
+            # a LATERAL subquery picks each conversation's newest messages
+            recent_messages = (
+                select(*_MESSAGE_READ_COLUMNS)
+                .where(ConversationMessage.conversation_id == Conversation.conversation_id)
+                .order_by(ConversationMessage.created_at.desc())
+                .limit(limit)
+                .lateral("recent_messages")
+            )
+            recent_columns = recent_messages.c
             result = await self.db.execute(
-                select(Conversation).where(
+                select(Conversation, *recent_columns)
+                .outerjoin(recent_messages, true())
+                .where(
                     and_(
                         Conversation.conversation_id == conversation_id,
                         Conversation.user_id == user_id
                     )
                 )
+                .order_by(recent_columns.created_at.asc())
             )
-            conversation = result.scalars().first()
+            rows = result.all()
 
-            if not conversation:
+            if not rows:
                 return None
 
-            # Get messages
-            messages = await self.get_conversation_messages(conversation_id, limit)
+            conversation = rows[0][0]
+            messages = [row for row in rows if row.id is not None]
 
             # Format for frontend
             return {
@@ -281,31 +569,25 @@ class ConversationManager:
     async def delete_conversation(self, conversation_id: str, user_id: str) -> bool:
         """Delete conversation with ownership validation"""
         try:
-            # Verify ownership and delete
+            # Ownership check and delete in one statement; messages go via ON DELETE CASCADE
             result = await self.db.execute(
-                select(Conversation).where(
+                delete(Conversation)
+                .where(
                     and_(
                         Conversation.conversation_id == conversation_id,
                         Conversation.user_id == user_id
                     )
                 )
+                .returning(Conversation.id)
             )
-            conversation = result.scalars().first()
 
-            if not conversation:
+            if result.first() is None:
+                await self.db.rollback()
                 logger.warning(f"Conversation {conversation_id} not found or not owned by user {user_id}")
                 return False
 
-            # Delete messages first (cascade should handle this, but explicit is better)
-            await self.db.execute(
-                select(ConversationMessage).where(
-                    ConversationMessage.conversation_id == conversation_id
-                )
-            )
-
-            # Delete conversation
-            await self.db.delete(conversation)
             await self.db.commit()
+            await self._drop_history(conversation_id)
 
             logger.info(f"Deleted conversation {conversation_id} for user {user_id}")
             return True
@@ -353,25 +635,20 @@ class ConversationManager:
     async def _mark_conversation_active(self, conversation_id: str, user_id: str, mode: str):
         """Mark specific conversation as active and deactivate others"""
         try:
-            # Deactivate all conversations for this user/mode
+            # One UPDATE: the target becomes active and gets a fresh updated_at,
+            # the user's other conversations in this mode are deactivated
+            is_target = Conversation.conversation_id == conversation_id
             await self.db.execute(
                 update(Conversation)
                 .where(
                     and_(
                         Conversation.user_id == user_id,
-                        Conversation.mode == mode
+                        or_(Conversation.mode == mode, is_target)
                     )
                 )
-                .values(is_active=False)
-            )
-
-            # Activate the specific conversation
-            await self.db.execute(
-                update(Conversation)
-                .where(Conversation.conversation_id == conversation_id)
                 .values(
-                    is_active=True,
-                    updated_at=datetime.utcnow()
+                    is_active=is_target,
+                    updated_at=case((is_target, datetime.utcnow()), else_=Conversation.updated_at)
                 )
             )
 
@@ -387,23 +664,11 @@ class ConversationManager:
         Extracted from legacy context management.
         """
         try:
-            messages = await self.get_conversation_messages(conversation_id, max_messages)
-            
-            if not messages:
-                return ""
-
-            context_parts = []
-            for msg in messages[-max_messages:]:  # Get most recent messages
-                if msg.role == "user":
-                    context_parts.append(f"User: {msg.content[:200]}...")
-                elif msg.role == "assistant":
-                    # Extract key information from assistant responses
-                    content = msg.content[:300]
-                    if msg.sources:
-                        content += f" [Sources: {len(msg.sources)} docs]"
-                    context_parts.append(f"Assistant: {content}...")
-
-            return "\n".join(context_parts)
+            result = await self.db.execute(
+                _CONTEXT_SUMMARY_SQL,
+                {"conversation_id": conversation_id, "limit": max_messages}
+            )
+            return result.scalar() or ""
 
         except Exception as e:
             logger.error(f"Error getting conversation context: {str(e)}")
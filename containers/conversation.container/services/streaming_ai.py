@@ -1,17 +1,60 @@
-from typing import AsyncGenerator, Dict, List, Any, Optional
+from typing import AsyncGenerator, Awaitable, Callable, Dict, List, Any, Optional, Set, Tuple, Union
 import asyncio
-import json
+import hashlib
+import orjson
 import logging
+import re
+import time
 from datetime import datetime
-import httpx
 import redis.asyncio as redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .conversation_manager import ConversationManager
-from ..core.config import get_settings
+from core.config import settings
+from core.database import ai_orchestrator_client, embedding_client
 
 logger = logging.getLogger(__name__)
-settings = get_settings()
+
+# NDJSON frame layouts with the fixed parts encoded once; output matches
+# orjson.dumps of the equivalent dicts. Only the variable fields are encoded per frame.
+_REACT_EVENT_TEMPLATE = b'{"type":"react","step":%b,"content":%b,"agent":%b,"timestamp":%b}\n'
+_ENCODED_STEPS = {step: orjson.dumps(step) for step in ("thought", "action", "observation", "final_answer")}
+_ENCODED_DEFAULT_AGENT = orjson.dumps("Flash AI")
+_RESPONSE_ENVELOPE_PREFIX = b'{"type":"response","data":'
+_ERROR_TEMPLATE = b'{"type":"error","message":%b,"timestamp":%b}\n'
+_ENCODED_ERRORS = {
+    message: orjson.dumps(message)
+    for message in (
+        "Failed to start AI reasoning task",
+        "Failed to get response from AI reasoning system"
+    )
+}
+
+# Phrases that mark a hedged or non-answer; one case-insensitive pass over the response
+_HEDGE_RE = re.compile(r"i don't know|i'm not sure|unable to|can't help", re.IGNORECASE)
+
+# Blocking XREAD window and batch size for ReAct steps; one batch is one write
+REACT_READ_BLOCK_MS = 30000
+REACT_READ_COUNT = 32
+
+# Task completion: MCP publishes and stores the terminal result on task:{task_id}:done
+_TERMINAL_STATUSES = frozenset(("complete", "failed", "aborted"))
+COMPLETION_RECHECK_SECONDS = 30.0  # re-read the stored result in case a publish was missed
+TASK_TIMEOUT_SECONDS = 600.0  # MCP keeps a task for 10 minutes; past that the stream gives up
+STATUS_POLL_INTERVAL = 0.5  # status endpoint polling, only without Redis or after a Redis error
+
+# Turn saves still running after their stream has finished; drained on shutdown
+_background_tasks: Set[asyncio.Task] = set()
+
+async def drain_background_tasks():
+    """Wait for in-flight turn saves so a shutdown does not drop messages"""
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+
+def _decoded(fields: Dict[bytes, bytes], name: bytes) -> Optional[str]:
+    """A stream entry field as text; the app's Redis client returns bytes"""
+    value = fields.get(name)
+    return value.decode() if value else None
 
 class StreamingAIService:
     """
@@ -19,24 +62,22 @@ class StreamingAIService:
     Forwards ReAct reasoning steps from MCP agents to frontend.
     """
 
-    def __init__(self, db: AsyncSession):
+    def __init__(
+        self,
+        db: AsyncSession,
+        redis_client: Optional[redis.Redis] = None,
+        stream_redis: Optional[redis.Redis] = None
+    ):
         self.db = db
-        self.conversation_manager = ConversationManager(db)
+        # The app's Redis client (bytes replies); also mirrors recent messages per conversation
+        self.redis_client = redis_client
+        # ReAct reads and the completion subscription hold a connection each for
+        # the whole stream, so they use the stream pool when one is given
+        self.stream_redis = stream_redis or redis_client
+        self.conversation_manager = ConversationManager(db, redis_client)
         self.mcp_url = settings.AI_ORCHESTRATOR_URL  # Now points to MCP
-        self.redis_client = None
-
-    async def initialize_redis(self):
-        """Initialize Redis connection for ReAct event subscription"""
-        try:
-            self.redis_client = redis.from_url(
-                settings.REDIS_URL,
-                decode_responses=True
-            )
-            await self.redis_client.ping()
-            logger.info("✅ Redis connection established for ReAct streaming")
-        except Exception as e:
-            logger.error(f"❌ Redis connection failed: {e}")
-            self.redis_client = None
+        # Keep-alive pool shared with the routes; closed in the app lifespan
+        self.http_client = ai_orchestrator_client
 
     async def process_query_with_reasoning(
         self,
@@ -45,26 +86,24 @@ class StreamingAIService:
         mode: str = "company",
         conversation_id: Optional[str] = None,
         ruleset_id: int = 1
-    ) -> AsyncGenerator[str, None]:
+    ) -> AsyncGenerator[bytes, None]:
         """
         Process query with MCP ReAct reasoning integration.
         Yields ReAct steps from MCP agents in real-time.
         """
+        # One clock read per turn, shared by the frames that need a timestamp
         start_time = datetime.now()
+        started = time.perf_counter()
         
         try:
-            # Initialize Redis if needed
-            if not self.redis_client:
-                await self.initialize_redis()
-            
             # Step 1: Initialize conversation
             conversation = await self.conversation_manager.get_or_create_active_conversation(
                 user_id, mode, conversation_id
             )
             conversation_id = conversation.conversation_id
             
-            # Save user message immediately
-            await self.conversation_manager.save_message(
+            # Stage user message; it is written with the assistant reply in one commit
+            self.conversation_manager.save_message_nocommit(
                 conversation_id=conversation_id,
                 role="user",
                 content=query,
@@ -75,154 +114,322 @@ class StreamingAIService:
             task_id = await self._start_mcp_task(query, user_id, mode, conversation_id)
             
             if not task_id:
-                yield self._format_error("Failed to start AI reasoning task")
+                yield self._format_error("Failed to start AI reasoning task", start_time)
                 return
 
-            # Step 3: Poll for ReAct events and final response
+            # Step 3: Forward ReAct events until the task finishes. A long
+            # blocking XREAD and the completion wait run side by side, so
+            # events go out as soon as Redis has them and nothing sleeps
+            stream_key = f"task:{task_id}:react_steps"
             last_event_id = "0-0"  # Start from beginning of stream
-            task_complete = False
-            
-            while not task_complete:
-                # Check for new ReAct events
-                try:
-                    if self.redis_client:
-                        stream_key = f"task:{task_id}:react_steps"
-                        events = await self.redis_client.xread({stream_key: last_event_id}, block=500)
-                        
-                        for stream, messages in events:
-                            for message_id, fields in messages:
-                                # Yield ReAct event to frontend
-                                react_event = {
-                                    "type": "react",
-                                    "step": fields.get("step", "thought"),
-                                    "content": fields.get("message", ""),
-                                    "agent": fields.get("agent", "Flash AI"),
-                                    "timestamp": fields.get("timestamp", datetime.now().isoformat())
-                                }
-                                yield self._format_react_event(react_event)
-                                last_event_id = message_id
-                                
-                except Exception as e:
-                    logger.warning(f"Error polling ReAct events: {e}")
-                
-                # Check if task is complete
+            completion = asyncio.create_task(self._wait_for_completion(task_id))
+            read = None
+            reading = self.stream_redis is not None
+
+            try:
+                while True:
+                    if reading and read is None:
+                        read = asyncio.create_task(self.stream_redis.xread(
+                            {stream_key: last_event_id}, block=REACT_READ_BLOCK_MS, count=REACT_READ_COUNT
+                        ))
+                    waiting = {completion, read} if read else {completion}
+                    done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+                    if read in done:
+                        try:
+                            events = read.result()
+                        except Exception as e:
+                            # Stop reading rather than retry in a tight loop; completion is still awaited
+                            logger.warning(f"Error reading ReAct events for task {task_id}; no further steps will be forwarded: {e}")
+                            events = []
+                            reading = False
+                        read = None
+                        frames, last_read_id = self._format_react_batch(events, start_time)
+                        if frames:
+                            yield frames
+                            last_event_id = last_read_id
+
+                    if completion in done:
+                        break
+            finally:
+                for pending in (read, completion):
+                    if pending and not pending.done():
+                        pending.cancel()
+
+            # Steps written just before completion may not have been read yet
+            if reading:
                 try:
-                    task_status = await self._check_task_status(task_id)
-                    if task_status:
-                        if task_status.get("status") == "complete":
-                            final_response = task_status.get("response")
-                            task_complete = True
-                            
-                            if final_response:
-                                # Calculate response time
-                                response_time_ms = int((datetime.now() - start_time).total_seconds() * 1000)
-                                
-                                # Save assistant response
-                                await self.conversation_manager.save_message(
-                                    conversation_id=conversation_id,
-                                    role="assistant",
-                                    content=final_response.get("content", ""),
-                                    mode=mode,
-                                    sources=final_response.get("sources", []),
-                                    confidence=final_response.get("confidence", 0.8),
-                                    response_time_ms=response_time_ms
-                                )
-
-                                # Yield final response
-                                yield self._format_final_response({
-                                    "response": final_response.get("content", ""),
-                                    "mode": mode,
-                                    "sources": final_response.get("sources", []),
-                                    "confidence": final_response.get("confidence", 0.8),
-                                    "conversation_id": conversation_id,
-                                    "timestamp": datetime.now().isoformat()
-                                })
-                            else:
-                                yield self._format_error("Failed to get response from AI reasoning system")
-                                
-                        elif task_status.get("status") == "failed":
-                            yield self._format_error(f"AI reasoning failed: {task_status.get('error', 'Unknown error')}")
-                            task_complete = True
-                            
+                    events = await self.stream_redis.xread({stream_key: last_event_id}, count=REACT_READ_COUNT)
+                    frames, _ = self._format_react_batch(events, start_time)
+                    if frames:
+                        yield frames
                 except Exception as e:
-                    logger.error(f"Error checking task status: {e}")
-                
-                # Small delay to prevent busy polling
-                if not task_complete:
-                    await asyncio.sleep(0.5)
+                    logger.warning(f"Error reading ReAct events: {e}")
+
+            task_status = completion.result()
+            if task_status.get("status") == "complete":
+                final_response = task_status.get("response")
+
+                if final_response:
+                    # Response time from the monotonic clock; wall-clock time only stamps the frame
+                    response_time_ms = int((time.perf_counter() - started) * 1000)
+                    completed_at = datetime.now()
+
+                    # Stage assistant response
+                    self.conversation_manager.save_message_nocommit(
+                        conversation_id=conversation_id,
+                        role="assistant",
+                        content=final_response.get("content", ""),
+                        mode=mode,
+                        sources=final_response.get("sources", []),
+                        confidence=final_response.get("confidence", 0.8),
+                        response_time_ms=response_time_ms
+                    )
+
+                    # Yield final response
+                    yield self._format_final_response({
+                        "response": final_response.get("content", ""),
+                        "mode": mode,
+                        "sources": final_response.get("sources", []),
+                        "confidence": final_response.get("confidence", 0.8),
+                        "conversation_id": conversation_id,
+                        "timestamp": completed_at
+                    })
+                else:
+                    yield self._format_error("Failed to get response from AI reasoning system", start_time)
+            else:
+                yield self._format_error(
+                    f"AI reasoning failed: {task_status.get('error', 'Unknown error')}", start_time
+                )
 
         except Exception as e:
             logger.error(f"Streaming AI error: {str(e)}")
-            yield self._format_error(f"Error processing request: {str(e)}")
+            yield self._format_error(f"Error processing request: {str(e)}", start_time)
+
+        finally:
+            # Both messages and the counter update for this turn, written after
+            # the final frame so the stream can close without waiting on Postgres.
+            # Also runs when the client disconnects mid-stream (GeneratorExit or
+            # cancellation), so the staged user message is never dropped
+            self._save_turn_in_background()
+
+    def _save_turn_in_background(self):
+        """Write the staged turn off the streaming path, on a session that outlives the request"""
+        task = asyncio.create_task(self._save_turn())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    async def _save_turn(self):
+        """Flush the staged turn, logging rather than raising on failure"""
+        try:
+            await self.conversation_manager.flush_turn_detached()
+        except Exception as e:
+            logger.error(f"Error saving turn: {e}")
 
     async def _start_mcp_task(self, query: str, user_id: str, mode: str, conversation_id: str) -> Optional[str]:
         """Start MCP task and return task ID"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.mcp_url}/api/v1/tasks/create",
-                    json={
-                        "query": query,
-                        "user_id": user_id,
-                        "mode": mode,
-                        "conversation_id": conversation_id,
-                        "template": "standard_query"
-                    },
-                    timeout=10.0
-                )
+            response = await self.http_client.post(
+                f"{self.mcp_url}/api/v1/tasks/create",
+                content=orjson.dumps({
+                    "query": query,
+                    "user_id": user_id,
+                    "mode": mode,
+                    "conversation_id": conversation_id,
+                    "template": "standard_query"
+                }),
+                headers={"Content-Type": "application/json"},
+                timeout=10.0
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                return result.get("task_id")
+            else:
+                logger.error(f"MCP task creation failed: {response.status_code}")
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    return result.get("task_id")
-                else:
-                    logger.error(f"MCP task creation failed: {response.status_code}")
-                    
         except Exception as e:
             logger.error(f"Error starting MCP task: {e}")
         
         return None
 
+    def _format_react_batch(self, events, timestamp: datetime) -> Tuple[bytes, Optional[bytes]]:
+        """
+        Format every step of an XREAD reply as one chunk of NDJSON frames,
+        so a burst of steps goes out in a single write. Returns the chunk
+        and the id of the last step in it.
+        """
+        frames = []
+        last_id = None
+        for _stream, messages in events:
+            for message_id, fields in messages:
+                frames.append(self._format_react_event(
+                    _decoded(fields, b"step") or "thought",
+                    _decoded(fields, b"message") or "",
+                    _decoded(fields, b"agent"),
+                    _decoded(fields, b"timestamp") or timestamp
+                ))
+                last_id = message_id
+        return b"".join(frames), last_id
+
+    async def _wait_for_completion(self, task_id: str) -> Dict:
+        """
+        Wait until the MCP task is complete, failed or aborted and return its result.
+        MCP pushes the terminal result to Redis; the status endpoint is only
+        polled without Redis or when Redis fails mid-wait. Gives up with a
+        failed status after TASK_TIMEOUT_SECONDS.
+        """
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + TASK_TIMEOUT_SECONDS
+        if self.stream_redis:
+            try:
+                task_status = await self._await_task_done(task_id, give_up_at)
+                if task_status is not None:
+                    return task_status
+                return {"status": "failed", "error": "Timed out waiting for the AI reasoning task"}
+            except redis.RedisError as e:
+                logger.warning(f"Falling back to status polling for task {task_id}: {e}")
+
+        while loop.time() < give_up_at:
+            task_status = await self._check_task_status(task_id)
+            if task_status and task_status.get("status") in _TERMINAL_STATUSES:
+                return task_status
+            await asyncio.sleep(STATUS_POLL_INTERVAL)
+        return {"status": "failed", "error": "Timed out waiting for the AI reasoning task"}
+
+    async def _await_task_done(self, task_id: str, give_up_at: float) -> Optional[Dict]:
+        """
+        Wait for the result MCP publishes and stores under task:{task_id}:done.
+        Returns None if nothing arrives by give_up_at (event loop time).
+        """
+        done_key = f"task:{task_id}:done"
+        loop = asyncio.get_running_loop()
+        pubsub = self.stream_redis.pubsub()
+        try:
+            await pubsub.subscribe(done_key)
+            while loop.time() < give_up_at:
+                # Read after subscribing, so a task finishing in between is not missed;
+                # a quiet channel past the recheck interval is re-checked the same way
+                payload = await self.redis_client.get(done_key)
+                if payload:
+                    return orjson.loads(payload)
+
+                deadline = min(loop.time() + COMPLETION_RECHECK_SECONDS, give_up_at)
+                while (remaining := deadline - loop.time()) > 0:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                    if message:
+                        return orjson.loads(message["data"])
+
+            # One last read covers a result stored just as the deadline passed
+            payload = await self.redis_client.get(done_key)
+            return orjson.loads(payload) if payload else None
+        finally:
+            await pubsub.aclose()
+
     async def _check_task_status(self, task_id: str) -> Optional[Dict]:
         """Check MCP task status"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.mcp_url}/api/v1/tasks/{task_id}/status",
-                    timeout=5.0
-                )
+            response = await self.http_client.get(
+                f"{self.mcp_url}/api/v1/tasks/{task_id}/status",
+                timeout=5.0
+            )
+            
+            if response.status_code == 200:
+                return response.json()
                 
-                if response.status_code == 200:
-                    return response.json()
-                    
         except Exception as e:
             logger.error(f"Error checking task status: {e}")
         
         return None
 
-    def _format_react_event(self, event_data: Dict) -> str:
+    @staticmethod
+    def _query_cache_key(prefix: str, mode: str, query: str) -> str:
+        """Redis key for a result that depends only on the normalized query and mode"""
+        digest = hashlib.sha256(f"{mode}|{query.strip().lower()}".encode()).hexdigest()[:32]
+        return f"{prefix}:{digest}"
+
+    async def _cached_by_query(
+        self,
+        prefix: str,
+        mode: str,
+        query: str,
+        ttl: int,
+        fetch: Callable[[], Awaitable[Optional[Dict]]]
+    ) -> Optional[Dict]:
+        """Serve a deterministic per-query lookup from Redis, falling back to fetch() on miss or error"""
+        key = self._query_cache_key(prefix, mode, query)
+        if self.redis_client:
+            try:
+                cached = await self.redis_client.get(key)
+                if cached is not None:
+                    return orjson.loads(cached)
+            except Exception as e:
+                logger.warning(f"Query cache read failed: {e}")
+
+        result = await fetch()
+
+        if result and self.redis_client:
+            try:
+                await self.redis_client.set(key, orjson.dumps(result), ex=ttl)
+            except Exception as e:
+                logger.warning(f"Query cache write failed: {e}")
+        return result
+
+    async def _enhanced_documentation_search(self, query: str, mode: str = "company") -> Optional[Dict]:
+        """Search indexed documentation via the embedding service; repeat queries are served from Redis"""
+        return await self._cached_by_query(
+            "search", mode, query, settings.SEARCH_CACHE_TTL,
+            lambda: self._search_documentation(query)
+        )
+
+    async def _search_documentation(self, query: str) -> Optional[Dict]:
+        """Call the embedding service's semantic search"""
+        try:
+            response = await embedding_client.post("/api/v1/search", json={"query": query, "max_results": 5})
+            if response.status_code == 200:
+                return {"sources": response.json().get("results", [])}
+            logger.error(f"Documentation search failed: {response.status_code}")
+        except Exception as e:
+            logger.error(f"Error searching documentation: {e}")
+        return None
+
+    async def _assess_response_quality(self, query: str, response: str, sources: List[Dict]) -> float:
+        """Heuristic confidence for a generated answer: hedged answers score low, sourced ones high"""
+        if not response or _HEDGE_RE.search(response):
+            return 0.3
+        return 0.9 if sources else 0.7
+
+    def _format_react_event(
+        self,
+        step: str,
+        content: str,
+        agent: Optional[str] = None,
+        timestamp: Optional[Union[str, datetime]] = None
+    ) -> bytes:
         """Format ReAct event for frontend"""
-        return json.dumps({
-            "type": event_data.get("type", "react"),
-            "step": event_data.get("step", "thought"),
-            "content": event_data.get("content", ""),
-            "agent": event_data.get("agent", "Flash AI"),
-            "timestamp": event_data.get("timestamp", datetime.now().isoformat())
-        }) + "\n"
-
-    def _format_final_response(self, data: Dict) -> str:
+        return _REACT_EVENT_TEMPLATE % (
+            _ENCODED_STEPS.get(step) or orjson.dumps(step),
+            orjson.dumps(content),
+            _ENCODED_DEFAULT_AGENT if agent is None else orjson.dumps(agent),
+            orjson.dumps(timestamp or datetime.now())
+        )
+
+    def _format_final_response(self, data: Dict) -> bytes:
         """Format final response data for frontend"""
-        return json.dumps({
-            "type": "response",
-            "data": data
-        }) + "\n"
+        return _RESPONSE_ENVELOPE_PREFIX + orjson.dumps(data) + b"}\n"
 
-    def _format_error(self, message: str) -> str:
+    def _format_error(self, message: str, timestamp: Optional[datetime] = None) -> bytes:
         """Format error message for frontend"""
-        return json.dumps({
-            "type": "error",
-            "message": message,
-            "timestamp": datetime.now().isoformat()
-        }) + "\n"
+        return _ERROR_TEMPLATE % (
+            _ENCODED_ERRORS.get(message) or orjson.dumps(message),
+            orjson.dumps(timestamp or datetime.now())
+        )
+
+    async def _search_for_chat(self, query: str, mode: str) -> Optional[Dict]:
+        """Run the company-mode documentation search"""
+        if mode == "company":
+            return await self._enhanced_documentation_search(query, mode)
+        return None
 
     async def process_regular_chat(
         self,
@@ -237,12 +444,17 @@ class StreamingAIService:
         Legacy compatibility for non-streaming endpoints.
         """
         try:
-            conversation = await self.conversation_manager.get_or_create_active_conversation(
-                user_id, mode, conversation_id
+            # The documentation search needs only the query, so it runs while the
+            # conversation is looked up; only the lookup uses the DB session
+            conversation, search_results = await asyncio.gather(
+                self.conversation_manager.get_or_create_active_conversation(
+                    user_id, mode, conversation_id
+                ),
+                self._search_for_chat(query, mode)
             )
             
-            # Save user message
-            await self.conversation_manager.save_message(
+            # Stage user message; it is written with the assistant reply in one commit
+            self.conversation_manager.save_message_nocommit(
                 conversation_id=conversation.conversation_id,
                 role="user",
                 content=query,
@@ -256,16 +468,14 @@ class StreamingAIService:
                 "conversation_history": []
             }
 
-            if mode == "company":
-                search_results = await self._enhanced_documentation_search(query)
-                if search_results:
-                    context["sources"] = search_results.get("sources", [])
+            if search_results:
+                context["sources"] = search_results.get("sources", [])
 
             response = await self._generate_ai_response(context)
             confidence = await self._assess_response_quality(query, response, context.get("sources", []))
 
-            # Save assistant response
-            await self.conversation_manager.save_message(
+            # Save assistant response together with the staged user message
+            self.conversation_manager.save_message_nocommit(
                 conversation_id=conversation.conversation_id,
                 role="assistant",
                 content=response,
@@ -292,4 +502,8 @@ class StreamingAIService:
                 "sources": [],
                 "confidence": 0.1,
                 "error": str(e)
-            } 
\ No newline at end of file
+            }
+
+        finally:
+            # Written after the reply is returned, as for streamed turns; also on cancellation
+            self._save_turn_in_background() 
\ No newline at end of file
@@ -1,20 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Request
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict, Any, Optional
+from sqlalchemy import text
+from typing import List, Dict, Any, Iterator, Optional
+import asyncio
+import hashlib
+from itertools import islice
 import logging
+import orjson
 
-from core.database import get_db
+from core.config import settings
+from core.database import get_db, get_redis, bump_search_cache_version, SEARCH_CACHE_VERSION_KEY
 from services.enhanced_search import EnhancedDocumentationService
 from services.vector_manager import VectorStoreManager
 from services.alias_discovery import SmartAliasDiscovery
+from services.index_jobs import IndexJobQueue
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Global service instances (will be initialized in main.py)
-enhanced_search = None
-vector_manager = None
-alias_discovery = None
+# Service singletons are built once in the main.py lifespan and kept on app.state
+
+def get_enhanced_search(request: Request) -> EnhancedDocumentationService:
+    """Get the shared enhanced documentation service"""
+    return request.app.state.enhanced_search
+
+def get_vector_manager(request: Request) -> VectorStoreManager:
+    """Get the shared vector store manager"""
+    return request.app.state.vector_manager
+
+def get_alias_discovery(request: Request) -> SmartAliasDiscovery:
+    """Get the shared alias discovery cache"""
+    return request.app.state.alias_discovery
+
+def get_index_jobs(request: Request) -> IndexJobQueue:
+    """Get the bulk indexing job queue"""
+    return request.app.state.index_jobs
+
+def _search_cache_key(
+    version: str,
+    query: str,
+    max_results: int,
+    min_confidence: float,
+    source_types: Optional[List[str]]
+) -> str:
+    """Redis key for a search response, from the index version and the request fields that shape it"""
+    digest = hashlib.blake2b(
+        orjson.dumps([query, max_results, min_confidence, source_types]),
+        digest_size=16
+    ).hexdigest()
+    return f"search:v{version}:{digest}"
 
 @router.post("/search")
 async def semantic_search(
@@ -25,13 +60,27 @@ async def semantic_search(
     context_optimization: Optional[Dict[str, Any]] = Body(None, embed=True),
     user_persona: Optional[Dict[str, Any]] = Body(None, embed=True),
     adaptive_recommendations: Optional[Dict[str, Any]] = Body(None, embed=True),
-    db: AsyncSession = Depends(get_db)
+    enhanced_search: EnhancedDocumentationService = Depends(get_enhanced_search),
+    vector_manager: VectorStoreManager = Depends(get_vector_manager),
+    redis_client = Depends(get_redis)
 ):
     """Enhanced semantic search with adaptive context optimization"""
-    global enhanced_search, vector_manager
     try:
         logger.info(f"🔍 Search request: '{query[:50]}{'...' if len(query) > 50 else ''}'")
         
+        # Identical non-personalized searches are served from Redis; adaptive
+        # requests depend on the caller's persona and are never cached
+        cache_key = None
+        if not adaptive_recommendations:
+            try:
+                version = await redis_client.get(SEARCH_CACHE_VERSION_KEY) or "0"
+                cache_key = _search_cache_key(version, query, max_results, min_confidence, source_types)
+                cached = await redis_client.get(cache_key)
+                if cached is not None:
+                    return Response(content=cached, media_type="application/json")
+            except Exception as e:
+                logger.warning(f"Search cache read failed: {e}")
+        
         optimized_max_results = max_results
         optimized_confidence = min_confidence
         query_expansion_enabled = True
@@ -61,12 +110,6 @@ async def semantic_search(
                     optimized_confidence = min(optimized_confidence + 0.05, 0.95)
                     logger.info(f"👨‍💻 Expert user detected in {len(expertise_areas)} areas - increasing precision")
         
-        if not enhanced_search:
-            enhanced_search = EnhancedDocumentationService(db=db)
-        
-        if not vector_manager:
-            vector_manager = VectorStoreManager()
-        
         if query_expansion_enabled and hasattr(enhanced_search, 'search_with_aliases'):
             results = await enhanced_search.search_with_aliases(
                 query=query,
@@ -79,7 +122,7 @@ async def semantic_search(
                 query=query,
                 limit=optimized_max_results,
                 score_threshold=optimized_confidence,
-                filters={"source_type": source_types[0]} if source_types else None
+                filters={"source_type": source_types} if source_types else None
             )
         
         optimization_metadata = {}
@@ -93,23 +136,29 @@ async def semantic_search(
                 "suggested_context_types": context_optimization.get("suggested_context_types", []) if context_optimization else []
             }
         
+        # Search hits carry title/source_type/url in their payload metadata; read
+        # it once per hit and only fall back to it when the hit lacks the field
         formatted_results = []
+        append = formatted_results.append
         for result in results:
-            formatted_result = {
-                "id": result.get("id", ""),
-                "title": result.get("title", result.get("metadata", {}).get("title", "Untitled")),
-                "content": result.get("text", result.get("content", "")),
-                "score": result.get("score", 0.0),
-                "source_type": result.get("source_type", result.get("metadata", {}).get("source_type", "unknown")),
-                "url": result.get("url", result.get("metadata", {}).get("url", "")),
-                "matched_query": result.get("matched_query", query),
-                "alias_expanded": result.get("alias_expanded", False)
-            }
-            formatted_results.append(formatted_result)
+            get = result.get
+            metadata = get("metadata") or {}
+            append({
+                "id": get("id", ""),
+                "title": get("title") or metadata.get("title", "Untitled"),
+                "content": get("text") or get("content", ""),
+                "score": get("score", 0.0),
+                "source_type": get("source_type") or metadata.get("source_type", "unknown"),
+                "url": get("url") or metadata.get("url", ""),
+                "matched_query": get("matched_query", query),
+                "alias_expanded": get("alias_expanded", False)
+            })
         
         logger.info(f"✅ Found {len(formatted_results)} results with adaptive optimization")
         
-        return {
+        # Encoded once for both the cache and the reply; returned as a Response
+        # so FastAPI skips the jsonable_encoder pass over every hit
+        body = orjson.dumps({
             "results": formatted_results,
             "query": query,
             "total_results": len(formatted_results),
@@ -121,7 +170,15 @@ async def semantic_search(
                 "actual_confidence_threshold": optimized_confidence,
                 "optimization_metadata": optimization_metadata
             }
-        }
+        })
+        
+        if cache_key:
+            try:
+                await redis_client.set(cache_key, body, ex=settings.SEARCH_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f"Search cache write failed: {e}")
+        
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         logger.error(f"Search error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
@@ -131,20 +188,18 @@ async def index_document(
     document_data: Dict[str, Any] = Body(...),
     source_type: str = Body("unknown"),
     force_reindex: bool = Body(False),
-    db: AsyncSession = Depends(get_db)
+    enhanced_search: EnhancedDocumentationService = Depends(get_enhanced_search),
+    redis_client = Depends(get_redis)
 ):
     """Index a single document with enhanced processing"""
-    global enhanced_search
     try:
-        if not enhanced_search:
-            enhanced_search = EnhancedDocumentationService(db=db)
-        
         # Enhanced document indexing
         result = await enhanced_search.index_document_enhanced(
             document_data=document_data,
             source_type=source_type,
             force_reindex=force_reindex
         )
+        await bump_search_cache_version(redis_client)
         
         return {
             "status": "success",
@@ -162,48 +217,89 @@ async def bulk_index_documents(
     documents: List[Dict[str, Any]] = Body(...),
     source_type: str = Body("unknown"),
     batch_size: int = Body(10),
-    db: AsyncSession = Depends(get_db)
+    index_jobs: IndexJobQueue = Depends(get_index_jobs)
 ):
-    """Bulk index multiple documents"""
-    global enhanced_search
+    """Queue multiple documents for bulk indexing; poll /index/bulk/{job_id} for the outcome"""
     try:
-        if not enhanced_search:
-            enhanced_search = EnhancedDocumentationService(db=db)
-        
-        results = await enhanced_search.bulk_index_documents(
+        job_id = await index_jobs.submit(
             documents=documents,
             source_type=source_type,
             batch_size=batch_size
         )
         
         return {
-            "status": "success",
-            "documents_processed": len(documents),
-            "successful_indexing": results.get("success_count", 0),
-            "failed_indexing": results.get("failure_count", 0),
-            "total_chunks": results.get("total_chunks", 0),
-            "processing_time": results.get("total_time", 0)
+            "status": "queued",
+            "job_id": job_id,
+            "documents_queued": len(documents)
         }
     except Exception as e:
         logger.error(f"Bulk indexing error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Bulk indexing failed: {str(e)}")
 
+@router.get("/index/bulk/{job_id}")
+async def get_bulk_index_status(
+    job_id: str,
+    index_jobs: IndexJobQueue = Depends(get_index_jobs)
+):
+    """Get the status of a queued bulk indexing job"""
+    status = await index_jobs.get_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, **status}
+
+# Polled read endpoints are revalidated with ETags; a match costs a header-only 304
+READ_CACHE_CONTROL = "max-age=5"
+
+def _etag(data: bytes) -> str:
+    """Short strong ETag for a version marker or an encoded body"""
+    return '"' + hashlib.blake2b(data, digest_size=8).hexdigest() + '"'
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    """304 response when the client already holds this version"""
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": READ_CACHE_CONTROL})
+    return None
+
+# Alias entries encoded per streamed chunk of /aliases
+ALIASES_STREAM_CHUNK = 500
+
+def _stream_aliases(aliases: Dict[str, List[str]], fields: Dict[str, Any]) -> Iterator[bytes]:
+    """The /aliases body, encoded a chunk of entries at a time instead of as one string"""
+    yield b'{"aliases_count":%d,"aliases":{' % len(aliases)
+    entries = iter(aliases.items())
+    separator = b""
+    while batch := list(islice(entries, ALIASES_STREAM_CHUNK)):
+        yield separator + b",".join(orjson.dumps(term) + b":" + orjson.dumps(values) for term, values in batch)
+        separator = b","
+    # The remaining fields, spliced in after the alias object
+    yield b"}," + orjson.dumps(fields)[1:]
+
 @router.get("/aliases")
-async def get_discovered_aliases():
+async def get_discovered_aliases(
+    request: Request,
+    alias_discovery: SmartAliasDiscovery = Depends(get_alias_discovery)
+):
     """Get all discovered semantic aliases"""
-    global alias_discovery
     try:
-        if not alias_discovery:
-            alias_discovery = SmartAliasDiscovery()
+        await alias_discovery.sync()
         
+        # Every change to the alias cache (refresh, indexing, sync) bumps its refresh time, which versions it
+        etag = _etag(f"{alias_discovery.get_last_refresh_time()}|{alias_discovery.is_cache_healthy()}".encode())
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+
         aliases = await alias_discovery.get_all_aliases()
         
-        return {
-            "aliases_count": len(aliases),
-            "aliases": aliases,
-            "cache_status": alias_discovery.get_cache_status(),
-            "last_refresh": alias_discovery.get_last_refresh_time()
-        }
+        return StreamingResponse(
+            _stream_aliases(aliases, {
+                "matcher": "aho-corasick",
+                "cache_status": alias_discovery.get_cache_status(),
+                "last_refresh": alias_discovery.get_last_refresh_time()
+            }),
+            media_type="application/json",
+            headers={"ETag": etag, "Cache-Control": READ_CACHE_CONTROL}
+        )
     except Exception as e:
         logger.error(f"Aliases retrieval error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to get aliases: {str(e)}")
@@ -211,17 +307,11 @@ async def get_discovered_aliases():
 @router.post("/aliases/refresh")
 async def refresh_aliases(
     force: bool = Body(False, embed=True),
-    db: AsyncSession = Depends(get_db)
+    alias_discovery: SmartAliasDiscovery = Depends(get_alias_discovery),
+    enhanced_search: EnhancedDocumentationService = Depends(get_enhanced_search)
 ):
     """Refresh semantic alias discovery"""
-    global alias_discovery, enhanced_search
     try:
-        if not alias_discovery:
-            alias_discovery = SmartAliasDiscovery()
-        
-        if not enhanced_search:
-            enhanced_search = EnhancedDocumentationService(db=db)
-        
         # Trigger alias refresh
         result = await alias_discovery.refresh_aliases(
             enhanced_search=enhanced_search,
@@ -240,20 +330,30 @@ async def refresh_aliases(
         raise HTTPException(status_code=500, detail=f"Alias refresh failed: {str(e)}")
 
 @router.get("/collections")
-async def get_collections():
+async def get_collections(
+    request: Request,
+    vector_manager: VectorStoreManager = Depends(get_vector_manager)
+):
     """Get Qdrant collection information"""
-    global vector_manager
     try:
-        if not vector_manager:
-            vector_manager = VectorStoreManager()
-        
         collections = await vector_manager.get_collections_info()
-        
-        return {
+
+        # Point counts have no version marker; tag the encoded body instead
+        body = orjson.dumps({
             "collections": collections,
             "status": "active",
-            "vector_dimensions": 1536
-        }
+            "vector_dimensions": settings.VECTOR_DIMENSIONS
+        })
+        etag = _etag(body)
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={"ETag": etag, "Cache-Control": READ_CACHE_CONTROL}
+        )
     except Exception as e:
         logger.error(f"Collections error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to get collections: {str(e)}")
@@ -261,14 +361,11 @@ async def get_collections():
 @router.post("/collections/create")
 async def create_collection(
     collection_name: str = Body(..., embed=True),
-    vector_size: int = Body(1536, embed=True)
+    vector_size: int = Body(settings.VECTOR_DIMENSIONS, embed=True),
+    vector_manager: VectorStoreManager = Depends(get_vector_manager)
 ):
     """Create a new Qdrant collection"""
-    global vector_manager
     try:
-        if not vector_manager:
-            vector_manager = VectorStoreManager()
-        
         result = await vector_manager.create_collection(
             collection_name=collection_name,
             vector_size=vector_size
@@ -284,29 +381,59 @@ async def create_collection(
         logger.error(f"Collection creation error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to create collection: {str(e)}")
 
+STATS_COUNTS_KEY = "embedding:stats:counts"
+
+# Both counts in one round trip, outside any explicit transaction. Planner row
+# estimates are kept current by autovacuum/ANALYZE; a table never analyzed has
+# reltuples = -1 and is counted exactly instead (the COUNT initplan only runs
+# when its CASE branch is taken)
+_TABLE_COUNTS_SQL = text("""
+    SELECT
+        CASE WHEN w.reltuples >= 0 THEN w.reltuples::bigint
+             ELSE (SELECT count(*) FROM wikis) END AS wikis,
+        CASE WHEN p.reltuples >= 0 THEN p.reltuples::bigint
+             ELSE (SELECT count(*) FROM wiki_page_indexes) END AS wiki_page_indexes
+    FROM pg_class w, pg_class p
+    WHERE w.oid = 'public.wikis'::regclass
+      AND p.oid = 'public.wiki_page_indexes'::regclass
+""")
+
+async def _cached_counts(db: AsyncSession, redis_client) -> Dict[str, int]:
+    """Row counts for /stats: Redis first, then pg_class estimates instead of full-table COUNTs"""
+    try:
+        cached = await redis_client.get(STATS_COUNTS_KEY)
+        if cached is not None:
+            return orjson.loads(cached)
+    except Exception as e:
+        logger.warning(f"Stats cache read failed: {e}")
+
+    result = await db.execute(_TABLE_COUNTS_SQL)
+    counts = dict(result.mappings().one())
+
+    try:
+        await redis_client.set(STATS_COUNTS_KEY, orjson.dumps(counts), ex=settings.STATS_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Stats cache write failed: {e}")
+    return counts
+
 @router.get("/stats")
-async def get_embedding_stats(db: AsyncSession = Depends(get_db)):
+async def get_embedding_stats(
+    db: AsyncSession = Depends(get_db),
+    redis_client = Depends(get_redis),
+    vector_manager: VectorStoreManager = Depends(get_vector_manager),
+    alias_discovery: SmartAliasDiscovery = Depends(get_alias_discovery)
+):
     """Get comprehensive embedding service statistics"""
-    global vector_manager, alias_discovery
     try:
-        # Get database stats
-        async with db.begin():
-            wiki_count_result = await db.execute("SELECT COUNT(*) FROM wikis")
-            wiki_count = wiki_count_result.scalar()
-            
-            page_count_result = await db.execute("SELECT COUNT(*) FROM wiki_page_indexes")
-            page_count = page_count_result.scalar()
-        
-        # Get vector store stats
-        if not vector_manager:
-            vector_manager = VectorStoreManager()
-        
-        vector_stats = await vector_manager.get_stats()
-        
-        # Get alias stats
-        if not alias_discovery:
-            alias_discovery = SmartAliasDiscovery()
+        # Database counts and vector store stats are independent I/O; overlap them
+        counts, vector_stats = await asyncio.gather(
+            _cached_counts(db, redis_client),
+            vector_manager.get_stats()
+        )
+        wiki_count = counts["wikis"]
+        page_count = counts["wiki_page_indexes"]
         
+        # Get alias stats (in memory)
         alias_stats = alias_discovery.get_stats()
         
         return {
@@ -325,15 +452,13 @@ async def get_embedding_stats(db: AsyncSession = Depends(get_db)):
 @router.delete("/index/{document_id}")
 async def delete_document(
     document_id: str,
-    db: AsyncSession = Depends(get_db)
+    enhanced_search: EnhancedDocumentationService = Depends(get_enhanced_search),
+    redis_client = Depends(get_redis)
 ):
     """Delete a document from the index"""
-    global enhanced_search
     try:
-        if not enhanced_search:
-            enhanced_search = EnhancedDocumentationService(db=db)
-        
         result = await enhanced_search.delete_document(document_id)
+        await bump_search_cache_version(redis_client)
         
         return {
             "status": "success",
@@ -348,18 +473,16 @@ async def delete_document(
 async def reindex_all(
     source_type: Optional[str] = Body(None, embed=True),
     force: bool = Body(False, embed=True),
-    db: AsyncSession = Depends(get_db)
+    enhanced_search: EnhancedDocumentationService = Depends(get_enhanced_search),
+    redis_client = Depends(get_redis)
 ):
     """Reindex all documents with enhanced processing"""
-    global enhanced_search
     try:
-        if not enhanced_search:
-            enhanced_search = EnhancedDocumentationService(db=db)
-        
         result = await enhanced_search.reindex_all(
             source_type=source_type,
             force=force
         )
+        await bump_search_cache_version(redis_client)
         
         return {
             "status": "success",
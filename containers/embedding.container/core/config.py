@@ -13,6 +13,13 @@ class Settings(BaseSettings):
     
     # Redis Configuration
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://redis:6379")
+    SEARCH_CACHE_TTL: int = int(os.getenv("SEARCH_CACHE_TTL", "60"))  # seconds a /search response is reused
+    STATS_CACHE_TTL: int = int(os.getenv("STATS_CACHE_TTL", "30"))  # seconds /stats row counts are reused
+    
+    # Semantic Search Cache (in-process, per worker)
+    SEMANTIC_CACHE_SIZE: int = int(os.getenv("SEMANTIC_CACHE_SIZE", "1024"))  # cached query embeddings and result sets
+    SEMANTIC_CACHE_TAU: float = float(os.getenv("SEMANTIC_CACHE_TAU", "0.97"))  # cosine similarity that reuses a cached result set
+    SEMANTIC_CACHE_TTL: int = int(os.getenv("SEMANTIC_CACHE_TTL", "60"))  # seconds a cached result set is reused
     
     # Qdrant Vector Database
     QDRANT_URL: str = os.getenv("QDRANT_URL", "http://qdrant:6333")
@@ -20,17 +27,29 @@ class Settings(BaseSettings):
     
     # OpenAI Configuration
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
-    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
-    VECTOR_DIMENSIONS: int = int(os.getenv("VECTOR_DIMENSIONS", "1536"))
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    VECTOR_DIMENSIONS: int = int(os.getenv("VECTOR_DIMENSIONS", "768"))  # requested from text-embedding-3 models
+    
+    # Qdrant binary quantization: 1-bit vectors in RAM, rescored against the originals
+    USE_BINARY_QUANTIZATION: bool = os.getenv("USE_BINARY_QUANTIZATION", "true").lower() == "true"
+    QUANTIZATION_OVERSAMPLING: float = float(os.getenv("QUANTIZATION_OVERSAMPLING", "2.0"))
     
     # Document Processing
     MAX_CHUNK_SIZE: int = int(os.getenv("MAX_CHUNK_SIZE", "800"))
     CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "100"))
     BATCH_SIZE: int = int(os.getenv("BATCH_SIZE", "100"))
     
+    # Bulk Indexing Queue (Redis Stream + consumer group)
+    INDEX_JOBS_STREAM: str = os.getenv("INDEX_JOBS_STREAM", "index_jobs")
+    INDEX_JOBS_MAXLEN: int = int(os.getenv("INDEX_JOBS_MAXLEN", "10000"))
+    INDEX_JOB_TTL: int = int(os.getenv("INDEX_JOB_TTL", "86400"))  # seconds a job's status is kept
+    INDEX_WORKERS: int = int(os.getenv("INDEX_WORKERS", "2"))
+    INDEX_JOB_CLAIM_IDLE_MS: int = int(os.getenv("INDEX_JOB_CLAIM_IDLE_MS", "300000"))  # pending this long without a heartbeat: owner is gone
+    
     # Smart Alias Discovery
     ALIAS_CONFIDENCE_THRESHOLD: float = float(os.getenv("ALIAS_CONFIDENCE_THRESHOLD", "0.7"))
     ALIAS_CACHE_TTL: int = int(os.getenv("ALIAS_CACHE_TTL", "86400"))  # 24 hours
+    ALIAS_SYNC_INTERVAL: int = int(os.getenv("ALIAS_SYNC_INTERVAL", "30"))  # seconds between checks for another worker's refresh
     
     # Flash Branding
     FLASH_BRAND_COLOR: str = "#7ed321"
@@ -2,6 +2,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from typing import AsyncGenerator
+from fastapi import Request
+import redis.asyncio as redis
 import logging
 
 from .config import settings
@@ -50,4 +52,23 @@ async def init_db():
         logger.info("✅ Database connection established")
     except Exception as e:
         logger.error(f"❌ Database connection failed: {e}")
-        raise 
\ No newline at end of file
+        raise 
+
+def create_redis_client(decode_responses: bool = True) -> redis.Redis:
+    """Create the process-wide Redis client"""
+    return redis.from_url(settings.REDIS_URL, decode_responses=decode_responses)
+
+def get_redis(request: Request) -> redis.Redis:
+    """Get the Redis client created in the app lifespan"""
+    return request.app.state.redis
+
+# Counter whose value is part of every cached search key; bumping it on any
+# index write orphans all cached responses, which then expire on their TTL
+SEARCH_CACHE_VERSION_KEY = "search:ver"
+
+async def bump_search_cache_version(redis_client: redis.Redis):
+    """Invalidate cached search responses after the index changes"""
+    try:
+        await redis_client.incr(SEARCH_CACHE_VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Search cache invalidation failed: {e}")
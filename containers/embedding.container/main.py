@@ -1,48 +1,66 @@
 from fastapi import FastAPI, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from contextlib import asynccontextmanager
 import logging
 from typing import Dict, Any
 import os
 
 from core.config import settings
-from core.database import get_db
+from core.database import get_db, create_redis_client
 from api.routes import router as api_router
 from services.enhanced_search import EnhancedDocumentationService
 from services.vector_manager import VectorStoreManager
 from services.alias_discovery import SmartAliasDiscovery
+from services.index_jobs import IndexJobQueue
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global service instances
+# Global service instances, shared with the routes through app.state
 vector_manager = VectorStoreManager()
 alias_discovery = SmartAliasDiscovery()
+enhanced_search = EnhancedDocumentationService(
+    vector_manager=vector_manager,
+    alias_discovery=alias_discovery
+)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     logger.info("🔍 Flash AI Embedding Service starting up...")
     
-    # Initialize services
+    # Initialize services once; routes get them through Depends
+    app.state.vector_manager = vector_manager
+    app.state.alias_discovery = alias_discovery
+    app.state.enhanced_search = enhanced_search
+    app.state.redis = create_redis_client()
+    app.state.index_jobs = IndexJobQueue(app.state.redis, enhanced_search)
     logger.info("✅ Vector Store Manager initialized")
     logger.info("✅ Enhanced Documentation Service ready")
+    await alias_discovery.warmup()
     logger.info("✅ Smart Alias Discovery loaded")
     
     # Initialize Qdrant connection
     await vector_manager.initialize_collections()
     logger.info("✅ Qdrant collections verified")
     
+    # Bulk indexing runs off the request path
+    await app.state.index_jobs.start()
+    
     yield
     
     logger.info("🛑 Flash AI Embedding Service shutting down...")
+    await app.state.index_jobs.stop()
+    await app.state.redis.aclose()
+    await alias_discovery.close()
 
 app = FastAPI(
     title="Flash AI Embedding Service",
     description="🔍 Document Processing, Vector Generation & Semantic Search",
     version="2.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc"
 )
@@ -5,11 +5,55 @@ from collections import defaultdict, Counter
 from datetime import datetime, timedelta
 import json
 import asyncio
+import time
+
+import ahocorasick
+import msgpack
 
 from core.config import settings
+from core.database import create_redis_client
 
 logger = logging.getLogger(__name__)
 
+# Shared alias cache: one hash of term -> msgpack alias list, versioned by its refresh time
+ALIASES_KEY = "aliases"
+ALIASES_REFRESHED_KEY = "aliases:refreshed_at"
+
+# Alias detection patterns (from legacy system), indexed by the constants below
+PARENTHETICAL, DASH, ALSO_KNOWN_AS, EMAIL = range(4)
+ALIAS_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        # Parenthetical aliases: "Stallions (SRE Team)"
+        r'(\w+(?:\s+\w+)*)\s*\(\s*([^)]+)\s*\)',
+        
+        # Dash notation: "SRE - Site Reliability Engineering"
+        r'(\w+(?:\s+\w+)*)\s*[-–—]\s*([^,\n.]+)',
+        
+        # "Also known as" patterns
+        r'(?:also\s+(?:known\s+as|called))\s+(?:the\s+)?([^,\n.]+)',
+        
+        # Email-based team indicators: "stallions@company.com"
+        r'(\w+)@[\w.-]+\.com',
+    )
+]
+
+# Longest phrase kept as a term or alias; longer captures are sentence fragments
+MAX_ALIAS_WORDS = 5
+
+def _normalize_alias(phrase: str) -> Optional[str]:
+    """Lowercased, whitespace-collapsed phrase, or None if it cannot be an alias"""
+    words = phrase.strip(" -–—'\"").split()
+    if not words or len(words) > MAX_ALIAS_WORDS or not any(c.isalpha() for c in phrase):
+        return None
+    return " ".join(words).lower()
+
+def _is_acronym(word: str) -> bool:
+    return 2 <= len(word) <= 6 and word.isalpha() and word.isupper()
+
+def _initials(words: List[str]) -> str:
+    return "".join(word[0] for word in words).lower()
+
 class SmartAliasDiscovery:
     """Enhanced alias discovery with pattern detection and relationship mapping"""
     
@@ -19,23 +63,18 @@ class SmartAliasDiscovery:
         
         # In-memory cache for discovered aliases
         self.aliases_cache: Dict[str, List[str]] = {}
+        # Aho-Corasick automaton over the cached terms, rebuilt on refresh
+        self._matcher: Optional[ahocorasick.Automaton] = None
         self.last_refresh: Optional[datetime] = None
         self.cache_healthy = False
         
-        # Alias detection patterns (from legacy system)
-        self.alias_patterns = [
-            # Parenthetical aliases: "Stallions (SRE Team)"
-            r'(\w+(?:\s+\w+)*)\s*\(\s*([^)]+)\s*\)',
-            
-            # Dash notation: "SRE - Site Reliability Engineering"
-            r'(\w+(?:\s+\w+)*)\s*[-–—]\s*([^,\n.]+)',
-            
-            # "Also known as" patterns
-            r'(?:also\s+(?:known\s+as|called))\s+(?:the\s+)?([^,\n.]+)',
-            
-            # Email-based team indicators: "stallions@company.com"
-            r'(\w+)@[\w.-]+\.com',
-        ]
+        # Redis copy of the cache, shared by every worker and kept across restarts
+        self._redis = create_redis_client(decode_responses=False)
+        self._synced_version: Optional[bytes] = None
+        self._last_sync = float("-inf")
+        
+        # Alias detection patterns, compiled once per process
+        self.alias_patterns = ALIAS_PATTERNS
         
         # Team indicator words
         self.team_indicators = {
@@ -60,18 +99,176 @@ class SmartAliasDiscovery:
             logger.error(f"❌ Failed to initialize alias cache: {e}")
             self.cache_healthy = False
     
+    async def warmup(self):
+        """Populate the alias cache at startup so the first searches already expand aliases"""
+        if not settings.ENABLE_ALIAS_DISCOVERY:
+            return
+        # Reuse what another worker or an earlier run discovered before discovering again
+        await self.sync(force=True)
+        if not self.aliases_cache:
+            await self.refresh_aliases()
+    
+    async def close(self):
+        """Close the shared cache connection"""
+        await self._redis.aclose()
+    
+    async def sync(self, force: bool = False):
+        """Load the shared alias cache if it was refreshed since this worker last saw it"""
+        now = time.monotonic()
+        if not force and now - self._last_sync < settings.ALIAS_SYNC_INTERVAL:
+            return
+        self._last_sync = now
+        
+        try:
+            version = await self._redis.get(ALIASES_REFRESHED_KEY)
+            if version is None or version == self._synced_version:
+                return
+            
+            stored = await self._redis.hgetall(ALIASES_KEY)
+            self.aliases_cache = {
+                term.decode(): msgpack.unpackb(aliases)
+                for term, aliases in stored.items()
+            }
+            self._build_matcher()
+            self.last_refresh = datetime.fromisoformat(version.decode())
+            self.cache_healthy = True
+            self._synced_version = version
+            logger.info(f"✅ Loaded {len(self.aliases_cache)} shared aliases")
+            
+        except Exception as e:
+            logger.warning(f"⚠️ Alias cache sync failed: {e}")
+    
+    async def _store(self, aliases: Optional[Dict[str, List[str]]] = None):
+        """
+        Merge terms (all cached terms by default) into the shared alias cache and
+        bump its version, in one transaction. Terms are never deleted, so aliases
+        another worker added since this one last synced are kept.
+        """
+        if aliases is None:
+            aliases = self.aliases_cache
+        version = self.last_refresh.isoformat().encode()
+        pipe = self._redis.pipeline(transaction=True)
+        if aliases:
+            pipe.hset(ALIASES_KEY, mapping={
+                term: msgpack.packb(term_aliases)
+                for term, term_aliases in aliases.items()
+            })
+            pipe.expire(ALIASES_KEY, self.cache_ttl)
+        pipe.set(ALIASES_REFRESHED_KEY, version, ex=self.cache_ttl)
+        await pipe.execute()
+        self._synced_version = version
+    
+    def scan(self, text: str) -> List[Tuple[int, "re.Match"]]:
+        """(pattern index, match) for every alias pattern match in the text, in text order"""
+        matches = [
+            (pattern_id, match)
+            for pattern_id, pattern in enumerate(self.alias_patterns)
+            for match in pattern.finditer(text)
+        ]
+        matches.sort(key=lambda found: found[1].start())
+        return matches
+
+    def discover_aliases_in_text(self, text: str, title: str = "") -> Dict[str, List[str]]:
+        """
+        Term -> aliases pairs found in a document by the alias patterns:
+        "Stallions (SRE Team)", "Site Reliability Engineering (SRE)",
+        "SRE - Site Reliability Engineering", "also known as X" (paired with
+        the title) and team mailboxes (paired with a team-like title).
+        Every pair is recorded in both directions.
+        """
+        discovered: Dict[str, Dict[str, None]] = defaultdict(dict)
+        
+        def pair(term: str, alias: str):
+            term, alias = _normalize_alias(term), _normalize_alias(alias)
+            if term and alias and term != alias:
+                discovered[term][alias] = None
+                discovered[alias][term] = None
+        
+        team_title = any(word in self.team_indicators for word in title.lower().split())
+        
+        for pattern_id, match in self.scan(text):
+            if pattern_id == PARENTHETICAL:
+                words = match.group(1).split()
+                alias = match.group(2).strip()
+                if _is_acronym(alias) and _initials(words[-len(alias):]) == alias.lower():
+                    # "Site Reliability Engineering (SRE)": the words the acronym abbreviates
+                    pair(" ".join(words[-len(alias):]), alias)
+                elif words[-1][:1].isupper():
+                    # "Stallions (SRE Team)": a named thing, not a "(see below)" aside
+                    pair(words[-1], alias)
+            
+            elif pattern_id == DASH:
+                # Dashes are common in prose; only an acronym spelled out after one counts
+                acronym = match.group(1).split()[-1]
+                words = match.group(2).split()[:len(acronym)]
+                if _is_acronym(acronym) and _initials(words) == acronym.lower():
+                    pair(acronym, " ".join(words))
+            
+            elif pattern_id == ALSO_KNOWN_AS and title:
+                pair(title, match.group(1))
+            
+            elif pattern_id == EMAIL and team_title:
+                pair(title, match.group(1))
+        
+        return {term: list(aliases) for term, aliases in discovered.items()}
+
+    def _build_matcher(self):
+        """Compile the cached terms into one automaton, swapped in once it is complete"""
+        matcher = ahocorasick.Automaton()
+        for term, aliases in self.aliases_cache.items():
+            matcher.add_word(term, (term, aliases))
+        if len(matcher):
+            matcher.make_automaton()
+            self._matcher = matcher
+        else:
+            self._matcher = None
+
+    async def add_aliases(self, aliases: Dict[str, List[str]]):
+        """Merge newly discovered aliases, rebuild the matcher and share them with other workers"""
+        # Extend existing terms rather than replacing their aliases; skip terms with nothing new
+        merged = {}
+        for term, term_aliases in aliases.items():
+            current = self.aliases_cache.get(term, [])
+            combined = list(dict.fromkeys([*current, *term_aliases]))
+            if combined != current:
+                merged[term] = combined
+        if not merged:
+            return
+        
+        self.aliases_cache.update(merged)
+        self._build_matcher()
+        # A new version, so /aliases revalidates and other workers reload on their next sync
+        self.last_refresh = datetime.utcnow()
+        
+        try:
+            await self._store(merged)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to share discovered aliases: {e}")
+
+    def match(self, query: str) -> List[Tuple[str, List[str]]]:
+        """Find every cached term that appears as whole words in the query, in one pass"""
+        if self._matcher is None:
+            return []
+
+        text = query.lower()
+        matches = []
+        for end, (term, aliases) in self._matcher.iter(text):
+            start = end - len(term) + 1
+            # Whole words only, so "sre" does not match inside "presreview"
+            if (start == 0 or not text[start - 1].isalnum()) and (end + 1 == len(text) or not text[end + 1].isalnum()):
+                matches.append((term, aliases))
+        return matches
+
     def expand_query_with_aliases(self, query: str) -> List[str]:
         """Expand a query using discovered aliases"""
-        expanded_queries = [query]
-        query_lower = query.lower()
+        # Dict keys dedupe in insertion order, so the original query stays first
+        expanded_queries = {query: None}
         
-        # Check for direct matches
-        if query_lower in self.aliases_cache:
-            for alias in self.aliases_cache[query_lower]:
-                expanded_queries.append(alias)
+        # Aliases of every known term in the query
+        for _term, aliases in self.match(query):
+            expanded_queries.update(dict.fromkeys(aliases))
         
-        # Remove duplicates and return
-        return list(set(expanded_queries))
+        return list(expanded_queries)
     
     async def get_all_aliases(self) -> Dict[str, List[str]]:
         """Get all discovered aliases"""
@@ -83,7 +280,8 @@ class SmartAliasDiscovery:
             "healthy": self.cache_healthy,
             "last_refresh": self.last_refresh.isoformat() if self.last_refresh else None,
             "aliases_count": len(self.aliases_cache),
-            "cache_ttl": self.cache_ttl
+            "cache_ttl": self.cache_ttl,
+            "matcher": "aho-corasick"
         }
     
     def get_last_refresh_time(self) -> Optional[str]:
@@ -124,10 +322,16 @@ class SmartAliasDiscovery:
                 'platform team': ['infrastructure team', 'ops team'],
                 'devops': ['development operations', 'platform engineering']
             })
+            self._build_matcher()
             
             self.last_refresh = datetime.utcnow()
             self.cache_healthy = True
             
+            try:
+                await self._store()
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to share refreshed aliases: {e}")
+            
             processing_time = (datetime.utcnow() - start_time).total_seconds()
             
             logger.info(f"✅ Alias refresh completed in {processing_time:.2f}s")
@@ -4,8 +4,6 @@ from typing import Dict, List, Optional, Any, Union
 from datetime import datetime
 import asyncio
 import hashlib
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_
 
 from core.config import settings
 from services.vector_manager import VectorStoreManager
@@ -16,10 +14,14 @@ logger = logging.getLogger(__name__)
 class EnhancedDocumentationService:
     """Enhanced documentation service with intelligent chunking and semantic search"""
     
-    def __init__(self, db: Optional[AsyncSession] = None):
-        self.db = db
-        self.vector_manager = VectorStoreManager()
-        self.alias_discovery = SmartAliasDiscovery()
+    def __init__(
+        self,
+        vector_manager: Optional[VectorStoreManager] = None,
+        alias_discovery: Optional[SmartAliasDiscovery] = None
+    ):
+        # Share the app's Qdrant client and alias cache when given
+        self.vector_manager = vector_manager or VectorStoreManager()
+        self.alias_discovery = alias_discovery or SmartAliasDiscovery()
         
         # Enhanced chunking settings
         self.max_chunk_size = settings.MAX_CHUNK_SIZE
@@ -40,20 +42,19 @@ class EnhancedDocumentationService:
         try:
             # Expand query with discovered aliases
             if self.enable_alias_discovery:
+                await self.alias_discovery.sync()
                 expanded_queries = self.alias_discovery.expand_query_with_aliases(query)
                 logger.info(f"🔍 Query expanded: {query} -> {expanded_queries}")
             else:
                 expanded_queries = [query]
             
+            # Filter on every requested source type (matched server-side by Qdrant)
+            filters = {"source_type": source_types} if source_types else {}
+            
             # Perform semantic search for each expanded query
             all_results = []
             
             for expanded_query in expanded_queries:
-                # Build filters for source types
-                filters = {}
-                if source_types:
-                    filters["source_type"] = source_types[0]  # Simplified for now
-                
                 # Perform vector search
                 results = await self.vector_manager.semantic_search(
                     query=expanded_query,
@@ -109,42 +110,36 @@ class EnhancedDocumentationService:
             # Intelligent chunking
             chunks = await self._intelligent_chunk_text(cleaned_content, title)
             
-            # Store document chunks with enhanced metadata
-            chunks_stored = 0
+            # Store document chunks with enhanced metadata; every chunk is
+            # embedded in one batched request and written in one upsert
             aliases_discovered = 0
-            
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"{document_id}_chunk_{i}"
-                
-                # Enhance chunk metadata
-                chunk_metadata = {
-                    "document_id": document_id,
-                    "chunk_index": i,
-                    "title": title,
-                    "url": url,
-                    "source_type": source_type,
-                    "content_type": self._detect_content_type(chunk),
-                    "chunk_size": len(chunk),
-                    "processed_at": datetime.utcnow().isoformat()
+            chunk_documents = [
+                {
+                    "id": f"{document_id}_chunk_{i}",
+                    "text": chunk,
+                    "metadata": {
+                        "document_id": document_id,
+                        "chunk_index": i,
+                        "title": title,
+                        "url": url,
+                        "source_type": source_type,
+                        "content_type": self._detect_content_type(chunk),
+                        "chunk_size": len(chunk),
+                        "processed_at": datetime.utcnow().isoformat()
+                    }
                 }
-                
-                # Store chunk embedding
-                success = await self.vector_manager.store_document_embedding(
-                    document_id=chunk_id,
-                    text=chunk,
-                    metadata=chunk_metadata
-                )
-                
-                if success:
-                    chunks_stored += 1
+                for i, chunk in enumerate(chunks)
+            ]
+            stored = await self.vector_manager.store_batch_embeddings(chunk_documents)
+            chunks_stored = stored["success"]
             
             # Discover aliases if enabled
             if self.enable_alias_discovery:
                 doc_aliases = self.alias_discovery.discover_aliases_in_text(cleaned_content, title)
                 aliases_discovered = len(doc_aliases)
                 
-                # Update alias cache
-                self.alias_discovery.aliases_cache.update(doc_aliases)
+                # Update alias cache and its matcher
+                await self.alias_discovery.add_aliases(doc_aliases)
             
             processing_time = (datetime.utcnow() - start_time).total_seconds()
             
@@ -172,7 +167,7 @@ class EnhancedDocumentationService:
         source_type: str = "unknown",
         batch_size: int = 10
     ) -> Dict[str, Any]:
-        """Bulk index multiple documents with batching"""
+        """Bulk index multiple documents with bounded concurrency"""
         try:
             start_time = datetime.utcnow()
             
@@ -182,29 +177,29 @@ class EnhancedDocumentationService:
                 "total_chunks": 0
             }
             
-            # Process documents in batches
-            for i in range(0, len(documents), batch_size):
-                batch = documents[i:i + batch_size]
-                
-                # Process batch concurrently
-                tasks = [
-                    self.index_document_enhanced(doc, source_type)
-                    for doc in batch
-                ]
-                
-                batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # Aggregate results
-                for result in batch_results:
-                    if isinstance(result, Exception):
-                        results["failure_count"] += 1
-                    elif result.get("status") == "success":
-                        results["success_count"] += 1
-                        results["total_chunks"] += result.get("chunks_count", 0)
-                    else:
-                        results["failure_count"] += 1
-                
-                logger.info(f"📊 Processed batch {i//batch_size + 1}: {len(batch)} documents")
+            # Index every document concurrently, at most batch_size (capped by
+            # MAX_CONCURRENT_EMBEDDINGS) at a time, without waiting for a whole
+            # batch to finish before the next document starts
+            semaphore = asyncio.Semaphore(max(1, min(batch_size, settings.MAX_CONCURRENT_EMBEDDINGS)))
+            
+            async def index_one(doc: Dict[str, Any]) -> Dict[str, Any]:
+                async with semaphore:
+                    return await self.index_document_enhanced(doc, source_type)
+            
+            document_results = await asyncio.gather(
+                *(index_one(doc) for doc in documents),
+                return_exceptions=True
+            )
+            
+            # Aggregate results
+            for result in document_results:
+                if isinstance(result, Exception):
+                    results["failure_count"] += 1
+                elif result.get("status") == "success":
+                    results["success_count"] += 1
+                    results["total_chunks"] += result.get("chunks_count", 0)
+                else:
+                    results["failure_count"] += 1
             
             total_time = (datetime.utcnow() - start_time).total_seconds()
             results["total_time"] = total_time
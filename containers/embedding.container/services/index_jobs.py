@@ -0,0 +1,187 @@
+import asyncio
+import orjson
+import logging
+import os
+import socket
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import ResponseError
+
+from core.config import settings
+from core.database import bump_search_cache_version
+from services.enhanced_search import EnhancedDocumentationService
+
+logger = logging.getLogger(__name__)
+
+WORKER_GROUP = "workers"
+READ_BLOCK_MS = 5000  # how long a worker waits for new jobs before looking for stale ones again
+
+class IndexJobQueue:
+    """Bulk indexing jobs queued on a Redis Stream and processed by background workers"""
+
+    def __init__(self, redis_client, enhanced_search: EnhancedDocumentationService):
+        self.redis = redis_client
+        self.enhanced_search = enhanced_search
+        self.stream = settings.INDEX_JOBS_STREAM
+        self._workers: List[asyncio.Task] = []
+
+    @staticmethod
+    def _status_key(job_id: str) -> str:
+        return f"index_job:{job_id}"
+
+    async def submit(self, documents: List[Dict[str, Any]], source_type: str, batch_size: int) -> str:
+        """Queue a bulk indexing job and return its id without waiting for the work"""
+        job_id = await self.redis.xadd(
+            self.stream,
+            {
+                "documents": orjson.dumps(documents),
+                "source_type": source_type,
+                "batch_size": str(batch_size)
+            },
+            maxlen=settings.INDEX_JOBS_MAXLEN,
+            approximate=True
+        )
+        # NX: a worker may already have picked the job up and marked it running
+        await self.redis.set(
+            self._status_key(job_id),
+            orjson.dumps({
+                "status": "queued",
+                "documents_queued": len(documents),
+                "queued_at": datetime.utcnow().isoformat()
+            }),
+            ex=settings.INDEX_JOB_TTL,
+            nx=True
+        )
+        return job_id
+
+    async def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current status of a job, or None if unknown or expired"""
+        data = await self.redis.get(self._status_key(job_id))
+        return orjson.loads(data) if data else None
+
+    async def _set_status(self, job_id: str, status: Dict[str, Any]):
+        await self.redis.set(self._status_key(job_id), orjson.dumps(status), ex=settings.INDEX_JOB_TTL)
+
+    async def start(self, worker_count: int = settings.INDEX_WORKERS):
+        """Create the consumer group if needed and start the workers"""
+        try:
+            await self.redis.xgroup_create(self.stream, WORKER_GROUP, id="$", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+        # Unique per process, so two processes on one host never share a consumer;
+        # jobs left by a dead process are reclaimed by idle time instead of by name
+        prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self._workers = [
+            asyncio.create_task(self._work(f"{prefix}-{n}"))
+            for n in range(worker_count)
+        ]
+        logger.info(f"✅ {worker_count} bulk indexing workers started")
+
+    async def stop(self):
+        """Stop the workers; unfinished jobs stay pending in the group"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _work(self, consumer: str):
+        """Process jobs one at a time: first any abandoned by a dead consumer, then new ones"""
+        claim_from = "0-0"
+        while True:
+            try:
+                claim_from, entries = await self._claim_stale(consumer, claim_from)
+                if not entries:
+                    response = await self.redis.xreadgroup(
+                        WORKER_GROUP, consumer, {self.stream: ">"}, count=1, block=READ_BLOCK_MS
+                    )
+                    entries = response[0][1] if response else []
+
+                for job_id, fields in entries:
+                    heartbeat = asyncio.create_task(self._keep_claimed(consumer, job_id))
+                    try:
+                        await self._run(job_id, fields)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        # Acknowledged anyway: a job that fails once would fail on every retry
+                        # and keep this worker from ever reaching new jobs
+                        logger.error(f"❌ Bulk indexing job {job_id} failed: {e}", exc_info=True)
+                        await self._fail(job_id, e)
+                    finally:
+                        heartbeat.cancel()
+                    await self.redis.xack(self.stream, WORKER_GROUP, job_id)
+                    await self.redis.xdel(self.stream, job_id)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Bulk indexing worker {consumer} error: {e}", exc_info=True)
+                await asyncio.sleep(1)
+
+    async def _claim_stale(self, consumer: str, start_id: str):
+        """Take over one job left pending longer than INDEX_JOB_CLAIM_IDLE_MS; returns the next scan position"""
+        next_id, claimed, *_ = await self.redis.xautoclaim(
+            self.stream, WORKER_GROUP, consumer,
+            min_idle_time=settings.INDEX_JOB_CLAIM_IDLE_MS, start_id=start_id, count=1
+        )
+        # Entries trimmed from the stream while pending come back without fields
+        entries = [(job_id, fields) for job_id, fields in claimed if fields]
+        for job_id, _ in entries:
+            logger.warning(f"⚠️ Bulk indexing job {job_id} reclaimed by {consumer}")
+        return next_id, entries
+
+    async def _keep_claimed(self, consumer: str, job_id: str):
+        """Reset a running job's idle time now and then, so long jobs are not reclaimed from a live worker"""
+        interval = settings.INDEX_JOB_CLAIM_IDLE_MS / 3000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.redis.xclaim(
+                    self.stream, WORKER_GROUP, consumer,
+                    min_idle_time=0, message_ids=[job_id], justid=True
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Heartbeat for bulk indexing job {job_id} failed: {e}")
+
+    async def _fail(self, job_id: str, error: Exception):
+        """Mark a job failed, keeping what its status already recorded"""
+        status = await self.get_status(job_id) or {}
+        status.update({
+            "status": "failed",
+            "error": str(error),
+            "finished_at": datetime.utcnow().isoformat()
+        })
+        await self._set_status(job_id, status)
+
+    async def _run(self, job_id: str, fields: Dict[str, str]):
+        """Index one job's documents and record the outcome"""
+        documents = orjson.loads(fields["documents"])
+        status = {
+            "status": "running",
+            "documents_queued": len(documents),
+            "started_at": datetime.utcnow().isoformat()
+        }
+        await self._set_status(job_id, status)
+
+        results = await self.enhanced_search.bulk_index_documents(
+            documents=documents,
+            source_type=fields.get("source_type", "unknown"),
+            batch_size=int(fields.get("batch_size", 10))
+        )
+        await bump_search_cache_version(self.redis)
+
+        status.update({
+            "status": "failed" if results.get("error") else "complete",
+            "documents_processed": len(documents),
+            "successful_indexing": results.get("success_count", 0),
+            "failed_indexing": results.get("failure_count", 0),
+            "total_chunks": results.get("total_chunks", 0),
+            "processing_time": results.get("total_time", 0),
+            "error": results.get("error"),
+            "finished_at": datetime.utcnow().isoformat()
+        })
+        await self._set_status(job_id, status)
+        logger.info(f"📦 Bulk indexing job {job_id} {status['status']}")
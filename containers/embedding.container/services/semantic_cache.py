@@ -0,0 +1,105 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+class SemanticSearchCache:
+    """
+    In-process cache for semantic search: query embeddings by exact text, and
+    result sets reused for any query whose embedding is close enough to a
+    cached query searched with the same parameters.
+    """
+
+    def __init__(self, size: int, dimensions: int, threshold: float, ttl: float):
+        self.size = size
+        self.dimensions = dimensions
+        self.threshold = threshold
+        self.ttl = ttl
+
+        # Exact text -> embedding, least recently used evicted first
+        self._embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+
+        # Result slots form a ring of unit vectors; the oldest slot is overwritten first
+        self._vectors = np.zeros((size, dimensions), dtype=np.float32)
+        self._param_ids = np.full(size, -1, dtype=np.int64)
+        self._stored_at = np.full(size, -np.inf)
+        self._results: List[Optional[List[Dict[str, Any]]]] = [None] * size
+        # Params <-> id for params that still own a slot, so at most `size` entries
+        self._param_index: Dict[Hashable, int] = {}
+        self._param_keys: Dict[int, Hashable] = {}
+        self._next_param_id = 0
+        self._next = 0
+
+    def get_embedding(self, text: str) -> Optional[List[float]]:
+        """Cached embedding for exactly this text"""
+        embedding = self._embeddings.get(text)
+        if embedding is not None:
+            self._embeddings.move_to_end(text)
+        return embedding
+
+    def put_embedding(self, text: str, embedding: List[float]):
+        self._embeddings[text] = embedding
+        self._embeddings.move_to_end(text)
+        if len(self._embeddings) > self.size:
+            self._embeddings.popitem(last=False)
+
+    def _unit(self, embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.shape != (self.dimensions,):
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def get_results(self, embedding: List[float], params: Hashable) -> Optional[List[Dict[str, Any]]]:
+        """Results of the most similar live cached query with the same params, if within the threshold"""
+        param_id = self._param_index.get(params)
+        query = self._unit(embedding)
+        if param_id is None or query is None:
+            return None
+
+        live = (self._param_ids == param_id) & (self._stored_at >= time.monotonic() - self.ttl)
+        if not live.any():
+            return None
+
+        # One matrix-vector product scores every slot; cosine, as all rows are unit length
+        similarities = np.where(live, self._vectors @ query, -1.0)
+        best = int(similarities.argmax())
+        if similarities[best] < self.threshold:
+            return None
+
+        # Callers annotate hits in place, so each gets its own dicts
+        return [dict(result) for result in self._results[best]]
+
+    def put_results(self, embedding: List[float], params: Hashable, results: List[Dict[str, Any]]):
+        query = self._unit(embedding)
+        if query is None:
+            return
+
+        param_id = self._param_index.get(params)
+        if param_id is None:
+            param_id = self._next_param_id
+            self._next_param_id += 1
+            self._param_index[params] = param_id
+            self._param_keys[param_id] = params
+
+        slot = self._next
+        replaced = int(self._param_ids[slot])
+        self._vectors[slot] = query
+        self._param_ids[slot] = param_id
+        self._stored_at[slot] = time.monotonic()
+        self._results[slot] = [dict(result) for result in results]
+        self._next = (slot + 1) % self.size
+
+        # Forget params whose last slot was just overwritten
+        if replaced >= 0 and replaced != param_id and not (self._param_ids == replaced).any():
+            del self._param_index[self._param_keys.pop(replaced)]
+
+    def clear_results(self):
+        """Drop cached result sets after the collection changes; embeddings stay valid"""
+        self._stored_at[:] = -np.inf
+        self._param_ids[:] = -1
+        self._results = [None] * self.size
+        self._param_index.clear()
+        self._param_keys.clear()
+        self._next = 0
@@ -9,9 +9,17 @@ from datetime import datetime
 import openai
 
 from core.config import settings
+from services.semantic_cache import SemanticSearchCache
 
 logger = logging.getLogger(__name__)
 
+def _embedding_options() -> Dict[str, Any]:
+    """Model arguments for embeddings.create; only text-embedding-3 models accept dimensions"""
+    options: Dict[str, Any] = {"model": settings.EMBEDDING_MODEL}
+    if settings.EMBEDDING_MODEL.startswith("text-embedding-3"):
+        options["dimensions"] = settings.VECTOR_DIMENSIONS
+    return options
+
 class VectorStoreManager:
     """Enhanced Qdrant vector store manager with lazy loading and optimizations"""
     
@@ -24,6 +32,22 @@ class VectorStoreManager:
         # OpenAI client for embeddings
         openai.api_key = settings.OPENAI_API_KEY
         
+        # Rescore the binary-quantized candidates against the full vectors
+        self._search_params = models.SearchParams(
+            quantization=models.QuantizationSearchParams(
+                rescore=True,
+                oversampling=settings.QUANTIZATION_OVERSAMPLING
+            )
+        ) if settings.USE_BINARY_QUANTIZATION else None
+        
+        # Repeated and near-identical queries skip the embedding call and Qdrant
+        self._search_cache = SemanticSearchCache(
+            size=settings.SEMANTIC_CACHE_SIZE,
+            dimensions=self.vector_size,
+            threshold=settings.SEMANTIC_CACHE_TAU,
+            ttl=settings.SEMANTIC_CACHE_TTL
+        )
+        
     async def _initialize_client(self):
         """Initialize Qdrant client with lazy loading (cow loading pattern)"""
         if self._initialized:
@@ -77,7 +101,7 @@ class VectorStoreManager:
     async def _ensure_collection_exists(
         self, 
         collection_name: str, 
-        vector_size: int = 1536,
+        vector_size: int = settings.VECTOR_DIMENSIONS,
         distance: models.Distance = models.Distance.COSINE
     ):
         """Ensure a collection exists, create if it doesn't"""
@@ -94,12 +118,38 @@ class VectorStoreManager:
                     vectors_config=models.VectorParams(
                         size=vector_size,
                         distance=distance
-                    )
+                    ),
+                    quantization_config=models.BinaryQuantization(
+                        binary=models.BinaryQuantizationConfig(always_ram=True)
+                    ) if settings.USE_BINARY_QUANTIZATION else None
                 )
                 logger.info(f"✅ Created collection: {collection_name}")
             else:
                 logger.info(f"✅ Collection already exists: {collection_name}")
                 
+                # Vectors from a different model or size cannot be searched together;
+                # refuse to start rather than fail every search and upsert in Qdrant
+                info = await asyncio.to_thread(self.client.get_collection, collection_name)
+                existing_size = getattr(info.config.params.vectors, "size", None)
+                if existing_size is not None and existing_size != vector_size:
+                    raise RuntimeError(
+                        f"Collection {collection_name} holds {existing_size}-dimension vectors "
+                        f"but {vector_size} are configured ({settings.EMBEDDING_MODEL}); "
+                        f"set QDRANT_COLLECTION_NAME to a new collection and reindex into it, "
+                        f"or set EMBEDDING_MODEL and VECTOR_DIMENSIONS back to match"
+                    )
+                
+                # Collections created before quantization was enabled get it now
+                if settings.USE_BINARY_QUANTIZATION and info.config.quantization_config is None:
+                    await asyncio.to_thread(
+                        self.client.update_collection,
+                        collection_name=collection_name,
+                        quantization_config=models.BinaryQuantization(
+                            binary=models.BinaryQuantizationConfig(always_ram=True)
+                        )
+                    )
+                    logger.info(f"✅ Enabled binary quantization on: {collection_name}")
+                
         except Exception as e:
             logger.error(f"❌ Error ensuring collection {collection_name}: {e}")
             raise
@@ -110,7 +160,7 @@ class VectorStoreManager:
             response = await asyncio.to_thread(
                 openai.embeddings.create,
                 input=text,
-                model=settings.EMBEDDING_MODEL
+                **_embedding_options()
             )
             return response.data[0].embedding
             
@@ -118,6 +168,14 @@ class VectorStoreManager:
             logger.error(f"❌ Failed to generate embedding: {e}")
             raise
     
+    async def _query_embedding(self, query: str) -> List[float]:
+        """Embedding for a search query, reused for repeated query text"""
+        embedding = self._search_cache.get_embedding(query)
+        if embedding is None:
+            embedding = await self.generate_embedding(query)
+            self._search_cache.put_embedding(query, embedding)
+        return embedding
+    
     async def store_document_embedding(
         self,
         document_id: str,
@@ -152,6 +210,7 @@ class VectorStoreManager:
                 points=[point]
             )
             
+            self._search_cache.clear_results()
             logger.info(f"✅ Stored embedding for document: {document_id}")
             return True
             
@@ -202,6 +261,7 @@ class VectorStoreManager:
                     points=points
                 )
                 
+                self._search_cache.clear_results()
                 results["success"] += len(points)
                 logger.info(f"✅ Stored batch of {len(points)} embeddings")
                 
@@ -217,7 +277,7 @@ class VectorStoreManager:
             response = await asyncio.to_thread(
                 openai.embeddings.create,
                 input=texts,
-                model=settings.EMBEDDING_MODEL
+                **_embedding_options()
             )
             return [data.embedding for data in response.data]
             
@@ -237,24 +297,39 @@ class VectorStoreManager:
         await self._initialize_client()
         
         try:
-            # Generate query embedding
-            query_embedding = await self.generate_embedding(query)
+            # Generate query embedding, then reuse the results of a near-identical
+            # earlier query searched with the same parameters
+            query_embedding = await self._query_embedding(query)
+            collection = collection_name or self.collection_name
+            cache_params = (
+                collection,
+                limit,
+                score_threshold,
+                tuple(sorted(
+                    (key, tuple(sorted(value)) if isinstance(value, (list, tuple, set)) else value)
+                    for key, value in (filters or {}).items()
+                ))
+            )
+            cached = self._search_cache.get_results(query_embedding, cache_params)
+            if cached is not None:
+                return cached
             
-            # Build search filter
+            # Build search filter; a list value matches any of its entries
             search_filter = None
             if filters:
                 search_filter = models.Filter(
                     must=[
                         models.FieldCondition(
                             key=key,
-                            match=models.MatchValue(value=value)
+                            match=models.MatchAny(any=list(value))
+                            if isinstance(value, (list, tuple, set))
+                            else models.MatchValue(value=value)
                         )
                         for key, value in filters.items()
                     ]
                 )
             
             # Perform search
-            collection = collection_name or self.collection_name
             search_results = await asyncio.to_thread(
                 self.client.search,
                 collection_name=collection,
@@ -262,6 +337,7 @@ class VectorStoreManager:
                 query_filter=search_filter,
                 limit=limit,
                 score_threshold=score_threshold,
+                search_params=self._search_params,
                 with_payload=True,
                 with_vectors=False
             )
@@ -277,6 +353,7 @@ class VectorStoreManager:
                     "metadata": {k: v for k, v in result.payload.items() if k != "text"}
                 })
             
+            self._search_cache.put_results(query_embedding, cache_params, results)
             logger.info(f"✅ Found {len(results)} results for query")
             return results
             
@@ -298,6 +375,7 @@ class VectorStoreManager:
                 )
             )
             
+            self._search_cache.clear_results()
             logger.info(f"✅ Deleted document: {document_id}")
             return True
             
@@ -334,12 +412,12 @@ class VectorStoreManager:
             logger.error(f"❌ Failed to get collections info: {e}")
             return []
     
-    async def create_collection(self, collection_name: str, vector_size: int = 1536) -> bool:
+    async def create_collection(self, collection_name: str, vector_size: Optional[int] = None) -> bool:
         """Create a new collection"""
         await self._initialize_client()
         
         try:
-            await self._ensure_collection_exists(collection_name, vector_size)
+            await self._ensure_collection_exists(collection_name, vector_size or self.vector_size)
             return True
             
         except Exception as e:
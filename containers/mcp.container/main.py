@@ -253,6 +253,7 @@ async def get_task_status(task_id: str) -> Dict[str, Any]:
             "updated_at": task_data["updated_at"],
             "template": task_data.get("template"),
             "plan": task_data.get("plan", []),
+            "response": task_data.get("response"),
             "error": task_data.get("error")
         }
         
@@ -21,6 +21,9 @@ from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Upper bound (approximate) on ReAct steps kept per task stream
+REACT_STREAM_MAXLEN = 500
+
 @dataclass
 class DAGTemplate:
     """Represents a task DAG template"""
@@ -164,17 +167,24 @@ class TaskCoordinator:
                                 json.dumps(frontend_event)
                             )
                             
-                            # Also store in task progress stream for history
+                            # Also store in task progress stream for history. The
+                            # stream is capped and expires with the task so finished
+                            # tasks do not leave their steps in Redis indefinitely
                             stream_key = f"task:{task_id}:react_steps"
-                            await self.redis_manager.redis.xadd(
+                            pipe = self.redis_manager.redis.pipeline(transaction=False)
+                            pipe.xadd(
                                 stream_key,
                                 {
                                     "step": react_data.get("step", "thought"),
                                     "message": react_data.get("message", ""),
                                     "agent": react_data.get("agent", "unknown"),
                                     "timestamp": react_data.get("timestamp", "")
-                                }
+                                },
+                                maxlen=REACT_STREAM_MAXLEN,
+                                approximate=True
                             )
+                            pipe.expire(stream_key, self.redis_manager.task_ttl)
+                            await pipe.execute()
                             
                     except Exception as e:
                         logger.warning(f"Failed to forward ReAct event: {e}")
@@ -628,6 +638,11 @@ class TaskCoordinator:
                 }
             )
             
+            await self.redis_manager.publish_task_done(task_id, {
+                "status": "complete",
+                "response": response
+            })
+            
             await self.message_broker.publish_event("ai:response:ready", {
                 "task_id": task_id,
                 "response": response,
@@ -700,6 +715,11 @@ class TaskCoordinator:
                     metadata={"failed_stage": stage}
                 )
                 
+                await self.redis_manager.publish_task_done(task_id, {
+                    "status": "failed",
+                    "error": task_data["error"]
+                })
+                
             logger.error(f"❌ Stage '{stage}' failed for task {task_id}")
             
         except Exception as e:
@@ -708,6 +728,7 @@ class TaskCoordinator:
     async def _handle_task_error(self, task_id: str, error: str):
         """Handle general task error"""
         try:
+            await self.redis_manager.publish_task_done(task_id, {"status": "failed", "error": error})
             await self.redis_manager.fail_task(task_id, error)
             logger.error(f"❌ Task {task_id} failed: {error}")
         except Exception as e:
@@ -761,6 +782,8 @@ class TaskCoordinator:
                     metadata={"action": "abort"}
                 )
                 
+                await self.redis_manager.publish_task_done(task_id, {"status": "aborted"})
+                
                 logger.info(f"🛑 Task {task_id} aborted")
                 return True
                 
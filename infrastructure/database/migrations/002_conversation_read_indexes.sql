@@ -0,0 +1,15 @@
+-- Migration: Conversation read-path indexes
+-- Date: 2026-10-17
+-- Description: Indexes backing the conversation service's hot reads
+--
+-- CONCURRENTLY cannot run inside a transaction block; apply with plain psql:
+--   docker-compose exec postgres psql -U postgres -d askflashdb -f /docker-entrypoint-initdb.d/002_conversation_read_indexes.sql
+
+-- get_active_conversation: user_id = ? AND is_active ORDER BY updated_at DESC LIMIT 1
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversation_histories_user_active
+    ON conversation_histories(user_id, updated_at DESC)
+    WHERE is_active = true;
+
+-- get_conversation / get_active_conversation: messages of one conversation in order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversation_messages_conversation_created
+    ON conversation_messages(conversation_id, created_at);
@@ -0,0 +1,10 @@
+-- Migration: Conversation listing index
+-- Date: 2026-10-17
+-- Description: Composite index for per-user conversation listings ordered by activity
+--
+-- CONCURRENTLY cannot run inside a transaction block; apply with plain psql:
+--   docker-compose exec postgres psql -U postgres -d askflashdb -f /docker-entrypoint-initdb.d/003_conversation_listing_index.sql
+
+-- user_id = ? ORDER BY updated_at DESC LIMIT n (backward scan serves DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversation_histories_user_updated
+    ON conversation_histories(user_id, updated_at);
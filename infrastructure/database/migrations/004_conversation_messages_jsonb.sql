@@ -0,0 +1,31 @@
+-- Migration: Conversation message JSON columns as JSONB
+-- Date: 2026-10-17
+-- Description: Store sources/thinking_steps as JSONB and index msg_metadata with GIN
+--
+-- CONCURRENTLY cannot run inside a transaction block; apply with plain psql:
+--   docker-compose exec postgres psql -U postgres -d askflashdb -f /docker-entrypoint-initdb.d/004_conversation_messages_jsonb.sql
+
+-- Columns created by older builds hold JSON text; convert in place
+DO $$
+DECLARE
+    col TEXT;
+BEGIN
+    FOREACH col IN ARRAY ARRAY['sources', 'thinking_steps'] LOOP
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'conversation_messages'
+              AND column_name = col
+              AND data_type = 'text'
+        ) THEN
+            EXECUTE format(
+                'ALTER TABLE conversation_messages ALTER COLUMN %I TYPE JSONB USING NULLIF(%I, '''')::jsonb',
+                col, col
+            );
+        END IF;
+    END LOOP;
+END
+$$;
+
+-- Metadata containment filters (msg_metadata @> '{"key": ...}')
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversation_messages_metadata_gin
+    ON conversation_messages USING gin (msg_metadata);
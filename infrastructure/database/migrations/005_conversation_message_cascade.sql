@@ -0,0 +1,34 @@
+-- Migration: Cascade message deletes from conversations
+-- Date: 2026-10-17
+-- Description: Recreate message -> conversation foreign keys with ON DELETE CASCADE
+--
+-- Tables created through SQLAlchemy create_all got a plain foreign key;
+-- deleting a conversation then needed a separate DELETE on its messages.
+
+DO $$
+DECLARE
+    fk RECORD;
+BEGIN
+    FOR fk IN
+        SELECT con.conname, con.conrelid::regclass AS child, con.confrelid::regclass AS parent,
+               child_col.attname AS child_column, parent_col.attname AS parent_column
+        FROM pg_constraint con
+        JOIN pg_attribute child_col
+            ON child_col.attrelid = con.conrelid AND child_col.attnum = con.conkey[1]
+        JOIN pg_attribute parent_col
+            ON parent_col.attrelid = con.confrelid AND parent_col.attnum = con.confkey[1]
+        WHERE con.contype = 'f'
+          AND con.confdeltype <> 'c'
+          AND (con.conrelid, con.confrelid) IN (
+              ('public.conversation_messages'::regclass, 'public.conversation_histories'::regclass),
+              (to_regclass('public.conversation_message'), to_regclass('public.conversation'))
+          )
+    LOOP
+        EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', fk.child, fk.conname);
+        EXECUTE format(
+            'ALTER TABLE %s ADD CONSTRAINT %I FOREIGN KEY (%I) REFERENCES %s(%I) ON DELETE CASCADE',
+            fk.child, fk.conname, fk.child_column, fk.parent, fk.parent_column
+        );
+    END LOOP;
+END
+$$;
@@ -0,0 +1,11 @@
+-- Migration: Ordered message index for the legacy conversation tables
+-- Date: 2026-10-17
+-- Description: Composite index serving per-conversation message reads in created_at order
+--
+-- conversation_messages already got the equivalent index in 002.
+-- CONCURRENTLY cannot run inside a transaction block; apply with plain psql:
+--   docker-compose exec postgres psql -U postgres -d askflashdb -f /docker-entrypoint-initdb.d/006_conversation_message_order_index.sql
+
+-- conversation_id = ? ORDER BY created_at [DESC LIMIT n]
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_conversation_message_conversation_created
+    ON public.conversation_message(conversation_id, created_at);
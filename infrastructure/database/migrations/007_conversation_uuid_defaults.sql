@@ -0,0 +1,8 @@
+-- Migration: Server-side UUID defaults for conversation tables
+-- Date: 2026-10-17
+-- Description: Generate conversation and message ids in Postgres instead of the service
+--
+-- gen_random_uuid() is built in from PostgreSQL 13, no extension needed.
+
+ALTER TABLE conversation_histories ALTER COLUMN id SET DEFAULT gen_random_uuid();
+ALTER TABLE conversation_messages ALTER COLUMN id SET DEFAULT gen_random_uuid();
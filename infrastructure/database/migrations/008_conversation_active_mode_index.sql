@@ -0,0 +1,11 @@
+-- Migration: Active conversation per user/mode index
+-- Date: 2026-10-17
+-- Description: Partial index for the legacy conversation table's active-conversation lookup
+--
+-- CONCURRENTLY cannot run inside a transaction block; apply with plain psql:
+--   docker-compose exec postgres psql -U postgres -d askflashdb -f /docker-entrypoint-initdb.d/008_conversation_active_mode_index.sql
+
+-- user_id = ? AND mode = ? AND is_active (at most one row per user/mode)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_conversation_user_mode_active
+    ON public.conversation(user_id, mode)
+    WHERE is_active;
@@ -385,7 +385,17 @@ class AsyncRedisTaskManager:
             except json.JSONDecodeError:
                 return None
         return None
-    
+
+    async def publish_task_done(self, task_id: str, result: Dict[str, Any]):
+        """Store and publish a task's terminal result on task:{task_id}:done"""
+        # The key covers consumers that subscribe after the publish
+        done_key = f"task:{task_id}:done"
+        payload = json.dumps(result)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.setex(done_key, self.task_ttl, payload)
+        pipe.publish(done_key, payload)
+        await pipe.execute()
+
     async def emit_progress_event(self, task_id: str, stage: str, message: str, metadata: Dict = None):
         """Async version of emit_progress_event"""
         event_data = {